@@ -1,7 +1,10 @@
+import argparse
 import csv
 import numpy as np
 from scipy.interpolate import interp1d
 
+header = ['frame_nmr', 'car_id', 'car_bbox', 'license_plate_bbox', 'license_plate_bbox_score', 'license_number', 'license_number_score']
+
 
 def interpolate_bounding_boxes(data):
     # Extract necessary data columns from input data
@@ -77,17 +80,30 @@ def interpolate_bounding_boxes(data):
     return interpolated_data
 
 
-# Load the CSV file
-with open('test.csv', 'r') as file:
-    reader = csv.DictReader(file)
-    data = list(reader)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Interpolar cajas en los frames sin detección")
+    parser.add_argument('--entrada', default='test.csv', help="CSV de detecciones")
+    parser.add_argument('--salida', default='test_interpolated.csv', help="CSV interpolado")
+    return parser.parse_args()
 
-# Interpolate missing data
-interpolated_data = interpolate_bounding_boxes(data)
 
-# Write updated data to a new CSV file
-header = ['frame_nmr', 'car_id', 'car_bbox', 'license_plate_bbox', 'license_plate_bbox_score', 'license_number', 'license_number_score']
-with open('test_interpolated.csv', 'w', newline='') as file:
-    writer = csv.DictWriter(file, fieldnames=header)
-    writer.writeheader()
-    writer.writerows(interpolated_data)
+def main():
+    args = parse_args()
+
+    # Load the CSV file
+    with open(args.entrada, 'r') as file:
+        reader = csv.DictReader(file)
+        data = list(reader)
+
+    # Interpolate missing data
+    interpolated_data = interpolate_bounding_boxes(data)
+
+    # Write updated data to a new CSV file
+    with open(args.salida, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(interpolated_data)
+
+
+if __name__ == "__main__":
+    main()
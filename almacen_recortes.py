@@ -0,0 +1,321 @@
+"""
+Almacén de recortes de placas: segmentos append-only con índice de offsets
+
+En lugar de un JPEG por placa y por frame, los recortes codificados se
+agregan al final de archivos de segmento grandes y cada uno deja un registro
+de tamaño fijo en un índice (frame_nmr, car_id, segmento, offset, longitud).
+Cada proceso escritor tiene su propio índice y sus segmentos, así los
+workers paralelos no se coordinan entre sí; el lector une todos los índices.
+
+    imagenes/almacen/principal.idx
+    imagenes/almacen/principal_00000.seg
+    imagenes/almacen/ocr0.idx ...
+
+Exportar a JPEGs individuales:
+    python almacen_recortes.py --carpeta imagenes/almacen --exportar imagenes/exportadas
+"""
+import argparse
+import glob
+import mmap
+import os
+import struct
+
+import cv2
+import numpy as np
+
+CARPETA_ALMACEN = "imagenes/almacen"
+
+# frame_nmr, car_id, segmento, offset, longitud
+REGISTRO = struct.Struct('<qqIQI')
+REGISTRO_DTYPE = np.dtype([('frame_nmr', '<i8'), ('car_id', '<i8'), ('segmento', '<u4'),
+                           ('offset', '<u8'), ('longitud', '<u4')])
+TAMANO_SEGMENTO = 256 * 1024 * 1024
+
+
+def _ruta_indice(carpeta, escritor):
+    return os.path.join(carpeta, f"{escritor}.idx")
+
+
+def _ruta_segmento(carpeta, escritor, segmento):
+    return os.path.join(carpeta, f"{escritor}_{segmento:05d}.seg")
+
+
+def _segmentos_de(carpeta, escritor):
+    """{numero: ruta} de los segmentos de un escritor"""
+    segmentos = {}
+    for ruta in glob.glob(os.path.join(glob.escape(carpeta), f"{glob.escape(escritor)}_*.seg")):
+        numero = os.path.basename(ruta)[len(escritor) + 1:-len('.seg')]
+        if numero.isdigit():
+            segmentos[int(numero)] = ruta
+    return segmentos
+
+
+def referencia_recorte(carpeta, frame_nmr, car_id):
+    """Referencia textual a un recorte del almacén (para eventos y reportes)"""
+    return f"{carpeta}#frame{frame_nmr}_car{car_id}"
+
+
+def vaciar_almacen(carpeta):
+    """Borrar índices y segmentos de una corrida anterior"""
+    for ruta in glob.glob(os.path.join(glob.escape(carpeta), '*.idx')) + \
+            glob.glob(os.path.join(glob.escape(carpeta), '*.seg')):
+        os.remove(ruta)
+
+
+class AlmacenRecortes:
+    """Escritor append-only de recortes para un proceso
+
+    Con `estado` (de `estado()`, guardado en un checkpoint) se descarta lo
+    escrito después; sin él se continúa tras el último registro completo del
+    índice, descartando datos huérfanos de una escritura interrumpida.
+    """
+
+    def __init__(self, carpeta=CARPETA_ALMACEN, escritor='principal', tamano_segmento=TAMANO_SEGMENTO,
+                 calidad_jpeg=95, estado=None):
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self.escritor = escritor
+        self.tamano_segmento = tamano_segmento
+        self.calidad_jpeg = calidad_jpeg
+
+        ruta_indice = _ruta_indice(carpeta, escritor)
+        if estado is not None:
+            tamano_indice = estado['indice']
+            self.segmento = estado['segmento']
+            self.offset = estado['offset']
+        else:
+            tamano_indice = os.path.getsize(ruta_indice) if os.path.exists(ruta_indice) else 0
+            tamano_indice -= tamano_indice % REGISTRO.size
+            self.segmento, self.offset = 0, 0
+            if tamano_indice > 0:
+                with open(ruta_indice, 'rb') as f:
+                    f.seek(tamano_indice - REGISTRO.size)
+                    _, _, self.segmento, offset, longitud = REGISTRO.unpack(f.read(REGISTRO.size))
+                self.offset = offset + longitud
+
+        # Recortar índice y segmentos al último registro válido
+        for numero, ruta in _segmentos_de(carpeta, escritor).items():
+            if numero > self.segmento:
+                os.remove(ruta)
+        if os.path.exists(ruta_indice):
+            os.truncate(ruta_indice, tamano_indice)
+        ruta_segmento = _ruta_segmento(carpeta, escritor, self.segmento)
+        if os.path.exists(ruta_segmento):
+            os.truncate(ruta_segmento, self.offset)
+
+        self.f_indice = open(ruta_indice, 'ab')
+        self.f_segmento = open(ruta_segmento, 'ab')
+
+    def agregar(self, frame_nmr, car_id, recorte):
+        """Codificar el recorte como JPEG y agregarlo; devuelve False si no se pudo codificar"""
+        if recorte is None or recorte.size == 0:
+            return False
+        ok, codificado = cv2.imencode('.jpg', recorte, [cv2.IMWRITE_JPEG_QUALITY, self.calidad_jpeg])
+        if not ok:
+            return False
+        self.agregar_bytes(frame_nmr, car_id, codificado.tobytes())
+        return True
+
+    def agregar_bytes(self, frame_nmr, car_id, datos):
+        if self.offset > 0 and self.offset + len(datos) > self.tamano_segmento:
+            self.f_segmento.close()
+            self.segmento += 1
+            self.offset = 0
+            self.f_segmento = open(_ruta_segmento(self.carpeta, self.escritor, self.segmento), 'ab')
+
+        # Datos antes que el registro: un índice nunca apunta a bytes sin escribir
+        self.f_segmento.write(datos)
+        self.f_indice.write(REGISTRO.pack(int(frame_nmr), int(car_id), self.segmento, self.offset, len(datos)))
+        self.offset += len(datos)
+
+    def estado(self):
+        """Vaciar a disco y devolver la posición actual (para checkpoints)"""
+        for f in (self.f_segmento, self.f_indice):
+            f.flush()
+            os.fsync(f.fileno())
+        return {'indice': self.f_indice.tell(), 'segmento': self.segmento, 'offset': self.offset}
+
+    def cerrar(self):
+        self.f_segmento.close()
+        self.f_indice.close()
+
+
+class _IndiceMapeado:
+    """Índice de un escritor mapeado en memoria, con búsqueda binaria por frame
+
+    Los registros no se copian a objetos de Python: se leen del archivo
+    mapeado. Cada escritor agrega en orden de frame; si un índice no lo está
+    se ordena solo una permutación (8 bytes por registro).
+    """
+
+    def __init__(self, ruta):
+        self.escritor = os.path.basename(ruta)[:-len('.idx')]
+        cantidad = os.path.getsize(ruta) // REGISTRO.size
+        self._archivo = open(ruta, 'rb')
+        self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ) if cantidad else None
+        self.registros = (np.frombuffer(self._mapa, dtype=REGISTRO_DTYPE, count=cantidad) if cantidad
+                          else np.empty(0, dtype=REGISTRO_DTYPE))
+
+        frames = self.registros['frame_nmr']
+        self.orden = None
+        if cantidad > 1 and np.any(frames[1:] < frames[:-1]):
+            self.orden = np.argsort(frames, kind='stable')
+
+    def __len__(self):
+        return len(self.registros)
+
+    def _registro(self, i):
+        return self.registros[i if self.orden is None else self.orden[i]]
+
+    def buscar(self, frame_nmr, car_id):
+        """(segmento, offset, longitud) del último registro de (frame_nmr, car_id), o None"""
+        bajo, alto = 0, len(self.registros)
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if self._registro(medio)['frame_nmr'] < frame_nmr:
+                bajo = medio + 1
+            else:
+                alto = medio
+
+        encontrado = None
+        while bajo < len(self.registros):
+            registro = self._registro(bajo)
+            if registro['frame_nmr'] != frame_nmr:
+                break
+            # Un recorte repetido conserva el último registro
+            if registro['car_id'] == car_id:
+                encontrado = (int(registro['segmento']), int(registro['offset']), int(registro['longitud']))
+            bajo += 1
+        return encontrado
+
+    def cerrar(self):
+        # Las vistas de numpy deben soltarse antes de cerrar el mapa
+        self.registros = self.orden = None
+        if self._mapa is not None:
+            self._mapa.close()
+        self._archivo.close()
+
+
+class LectorRecortes:
+    """Acceso aleatorio a los recortes por (frame_nmr, car_id)
+
+    Los índices se mapean en memoria y no se cargan en diccionarios: abrir un
+    almacén de varios días no ocupa más RAM que la página de índice tocada.
+    """
+
+    def __init__(self, carpeta=CARPETA_ALMACEN):
+        self.carpeta = carpeta
+        self._abiertos = {}
+        self.indices = [_IndiceMapeado(ruta)
+                        for ruta in sorted(glob.glob(os.path.join(glob.escape(carpeta), '*.idx')))]
+
+    def __len__(self):
+        """Cantidad de registros (un recorte repetido cuenta cada vez)"""
+        return sum(len(indice) for indice in self.indices)
+
+    def __contains__(self, clave):
+        return self._buscar(*clave) is not None
+
+    def _buscar(self, frame_nmr, car_id):
+        # Un recorte repetido en varios índices conserva el del último, como al unirlos
+        for indice in reversed(self.indices):
+            entrada = indice.buscar(int(frame_nmr), int(car_id))
+            if entrada is not None:
+                return (indice.escritor,) + entrada
+        return None
+
+    def vehiculos(self):
+        """Cantidad de car_id distintos en el almacén"""
+        car_ids = [np.unique(indice.registros['car_id']) for indice in self.indices]
+        return len(np.unique(np.concatenate(car_ids))) if car_ids else 0
+
+    def _archivo(self, escritor, segmento):
+        clave = (escritor, segmento)
+        if clave not in self._abiertos:
+            self._abiertos[clave] = open(_ruta_segmento(self.carpeta, escritor, segmento), 'rb')
+        return self._abiertos[clave]
+
+    def leer_bytes(self, frame_nmr, car_id):
+        """JPEG codificado del recorte, o None si no existe"""
+        entrada = self._buscar(frame_nmr, car_id)
+        if entrada is None:
+            return None
+        escritor, segmento, offset, longitud = entrada
+        f = self._archivo(escritor, segmento)
+        f.seek(offset)
+        return f.read(longitud)
+
+    def leer(self, frame_nmr, car_id):
+        """Recorte decodificado (BGR), o None si no existe"""
+        datos = self.leer_bytes(frame_nmr, car_id)
+        if datos is None:
+            return None
+        return cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def exportar(self, carpeta_destino, plantilla="placa_frame{frame}_car{car}.jpg"):
+        """Escribir cada recorte como JPEG individual (sin recodificar); devuelve los registros escritos
+
+        Se recorren los índices en orden: un recorte repetido queda con el último registro.
+        """
+        os.makedirs(carpeta_destino, exist_ok=True)
+        for indice in self.indices:
+            for frame_nmr, car_id, segmento, offset, longitud in indice.registros:
+                f = self._archivo(indice.escritor, int(segmento))
+                f.seek(int(offset))
+                ruta = os.path.join(carpeta_destino, plantilla.format(frame=frame_nmr, car=car_id))
+                with open(ruta, 'wb') as destino:
+                    destino.write(f.read(int(longitud)))
+        return len(self)
+
+    def tamano_bytes(self):
+        return sum(os.path.getsize(ruta) for ruta in glob.glob(os.path.join(glob.escape(self.carpeta), '*.seg')))
+
+    def cerrar(self):
+        for f in self._abiertos.values():
+            f.close()
+        self._abiertos = {}
+        for indice in self.indices:
+            indice.cerrar()
+        self.indices = []
+
+
+def remapear_ids(carpeta, escritor, mapa):
+    """Reescribir el índice de un escritor con car_id nuevos ({id_local: id_global})
+
+    Solo se reescribe el índice (reemplazo atómico); los segmentos no se tocan.
+    """
+    ruta = _ruta_indice(carpeta, escritor)
+    if not os.path.exists(ruta):
+        return
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    datos = datos[:len(datos) - len(datos) % REGISTRO.size]
+
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        for frame_nmr, car_id, segmento, offset, longitud in REGISTRO.iter_unpack(datos):
+            f.write(REGISTRO.pack(frame_nmr, mapa.get(car_id, car_id), segmento, offset, longitud))
+    os.replace(temporal, ruta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Almacén de recortes de placas")
+    parser.add_argument('--carpeta', default=CARPETA_ALMACEN, help="Carpeta del almacén")
+    parser.add_argument('--exportar', metavar='DESTINO', help="Exportar todos los recortes como JPEG individuales")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.carpeta):
+        print(f"❌ No existe el almacén {args.carpeta}")
+        return
+
+    lector = LectorRecortes(args.carpeta)
+    print(f"📦 {len(lector)} recortes de {lector.vehiculos()} vehículos ({lector.tamano_bytes():,} bytes)")
+
+    if args.exportar:
+        cantidad = lector.exportar(args.exportar)
+        print(f"✅ {cantidad} imágenes exportadas a {args.exportar}")
+    lector.cerrar()
+
+
+if __name__ == "__main__":
+    main()
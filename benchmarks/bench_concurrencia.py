@@ -0,0 +1,138 @@
+"""
+Benchmark: throughput agregado con 1..N trabajos concurrentes en un mismo host
+
+Cada trabajo es un proceso independiente (como varias instancias de main.py o
+los workers de --workers). Se compara dejar que PyTorch, OpenCV y BLAS usen
+todos los núcleos en cada proceso ("libre") contra repartir el presupuesto de
+núcleos con recursos.configurar_hilos ("presupuesto").
+
+Con --video se procesa el pipeline real (ProcesadorPlacas); sin video se usa
+una carga sintética con las mismas operaciones de OpenCV que preprocess_plate
+sobre frames grandes, más una convolución de torch si está instalado.
+
+Uso:
+    python -m benchmarks.bench_concurrencia --trabajos 1 2 4 8
+    python -m benchmarks.bench_concurrencia --video trafico.mp4 --frames 200 --trabajos 1 2 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+# Sin numpy/cv2/torch a nivel de módulo: los hijos (spawn) reimportan este
+# archivo y las variables de hilos deben fijarse antes de cargar esas bibliotecas
+import recursos
+
+
+def carga_sintetica():
+    """Devuelve una función que procesa un frame sintético (redimensionado, umbral, morfología)"""
+    import cv2
+    import numpy as np
+
+    frame = np.random.default_rng(0).integers(0, 255, size=(1080, 1920, 3), dtype=np.uint8)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    try:
+        import torch
+
+        conv = torch.nn.Conv2d(3, 16, 3, padding=1)
+        tensor = torch.rand(1, 3, 384, 640)
+    except ImportError:
+        conv = None
+
+    def paso(_):
+        grande = cv2.resize(frame, (3840, 2160))
+        gris = cv2.GaussianBlur(cv2.cvtColor(grande, cv2.COLOR_BGR2GRAY), (3, 3), 0)
+        umbral = cv2.adaptiveThreshold(gris, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 35, 11)
+        cv2.morphologyEx(umbral, cv2.MORPH_CLOSE, kernel)
+        if conv is not None:
+            with torch.no_grad():
+                conv(tensor)
+
+    return paso
+
+
+def carga_pipeline(ruta_video, num_frames, carpeta_imagenes):
+    """Devuelve una función que procesa el siguiente frame del video con ProcesadorPlacas"""
+    import cv2
+
+    from pipeline import ProcesadorPlacas
+
+    procesador = ProcesadorPlacas(verbose=False,
+                                  plantilla_imagen=os.path.join(carpeta_imagenes, "placa_frame{frame}_car{car}.jpg"))
+    cap = cv2.VideoCapture(ruta_video)
+    frames = []
+    while len(frames) < num_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+
+    def paso(n):
+        procesador.procesar_frame(n, frames[n % len(frames)])
+
+    return paso
+
+
+def trabajo(hilos, ruta_video, num_frames, carpeta_imagenes, barrera, resultados):
+    if hilos:
+        recursos.configurar_hilos(hilos)
+
+    if ruta_video:
+        paso = carga_pipeline(ruta_video, num_frames, carpeta_imagenes)
+    else:
+        paso = carga_sintetica()
+    paso(0)  # calentamiento fuera de la medición
+
+    barrera.wait()
+    inicio = time.perf_counter()
+    for n in range(num_frames):
+        paso(n)
+    resultados.put(time.perf_counter() - inicio)
+
+
+def medir(contexto, num_trabajos, hilos, ruta_video, num_frames, carpeta_imagenes):
+    barrera = contexto.Barrier(num_trabajos)
+    resultados = contexto.Queue()
+    procesos = [contexto.Process(target=trabajo,
+                                 args=(hilos, ruta_video, num_frames, carpeta_imagenes, barrera, resultados))
+                for _ in range(num_trabajos)]
+    for proceso in procesos:
+        proceso.start()
+    tiempos = [resultados.get() for _ in procesos]
+    for proceso in procesos:
+        proceso.join()
+
+    # Todos arrancan juntos: el agregado lo marca el trabajo más lento
+    return num_trabajos * num_frames / max(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput agregado con trabajos concurrentes")
+    parser.add_argument('--video', help="Video para el pipeline real (sin video: carga sintética)")
+    parser.add_argument('--frames', type=int, default=50, help="Frames por trabajo")
+    parser.add_argument('--trabajos', type=int, nargs='+', default=None,
+                        help="Cantidades de trabajos concurrentes (por defecto 1, 2, 4... hasta los núcleos)")
+    parser.add_argument('--nucleos', type=int, default=None, help="Presupuesto de núcleos a repartir")
+    args = parser.parse_args()
+
+    nucleos = args.nucleos or recursos.nucleos_disponibles()
+    trabajos = args.trabajos or sorted({2 ** i for i in range(nucleos.bit_length())} | {nucleos})
+    contexto = multiprocessing.get_context('spawn')
+
+    print(f"{nucleos} núcleos, {args.frames} frames por trabajo, "
+          f"carga {'pipeline: ' + args.video if args.video else 'sintética'}")
+    print(f"{'trabajos':>8} {'hilos/trabajo':>13} {'libre fps':>10} {'presupuesto fps':>16} {'mejora':>7}")
+
+    with tempfile.TemporaryDirectory() as carpeta_imagenes:
+        for num_trabajos in trabajos:
+            hilos = recursos.hilos_por_proceso(nucleos, num_trabajos)
+            fps_libre = medir(contexto, num_trabajos, None, args.video, args.frames, carpeta_imagenes)
+            fps_presupuesto = medir(contexto, num_trabajos, hilos, args.video, args.frames, carpeta_imagenes)
+            print(f"{num_trabajos:>8} {hilos:>13} {fps_libre:>10.2f} {fps_presupuesto:>16.2f} "
+                  f"{fps_presupuesto / fps_libre:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
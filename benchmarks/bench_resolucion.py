@@ -0,0 +1,101 @@
+"""
+Benchmark de la política de resolución: throughput y tasa de lectura de placas
+
+Procesa los primeros frames de cada video (por ejemplo uno 1080p y uno 4K)
+con varias resoluciones de detección de vehículos, con placas detectadas en
+el frame completo o en recortes a resolución completa de cada vehículo.
+
+Uso:
+    python -m benchmarks.bench_resolucion --videos trafico_1080p.mp4 trafico_4k.mp4
+    python -m benchmarks.bench_resolucion --videos trafico_4k.mp4 --lados 0 1280 960 640 --frames 500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+
+from pipeline import ProcesadorPlacas, PoliticaResolucion
+from tracker import crear_tracker
+from util import license_consensus
+
+
+def medir(ruta_video, politica, num_frames, carpeta_imagenes):
+    """Procesar `num_frames` frames y devolver métricas de la configuración"""
+    procesador = ProcesadorPlacas(
+        politica=politica, verbose=False,
+        plantilla_imagen=os.path.join(carpeta_imagenes, "placa_frame{frame}_car{car}.jpg")
+    )
+    cap = cv2.VideoCapture(ruta_video)
+
+    # Calentar los modelos fuera de la medición
+    ret, frame = cap.read()
+    if not ret:
+        return None
+    procesador.procesar_frame(0, frame)
+    procesador.mot_tracker = crear_tracker('sort')
+    procesador.lecturas_por_auto = {}
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    placas = 0
+    leidas = 0
+    frames = 0
+    inicio = time.perf_counter()
+
+    while frames < num_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        _, frame_results = procesador.procesar_frame(frames, frame)
+        for datos in frame_results.values():
+            placas += 1
+            if datos['license_plate']['text'] != 'UNKNOWN':
+                leidas += 1
+        frames += 1
+
+    tiempo = time.perf_counter() - inicio
+    cap.release()
+
+    vehiculos_con_placa = sum(
+        1 for lecturas in procesador.lecturas_por_auto.values() if license_consensus(lecturas)[0]
+    )
+    return {
+        'fps': frames / max(tiempo, 1e-9),
+        'placas': placas,
+        'tasa_lectura': leidas / placas if placas else 0.0,
+        'vehiculos_con_placa': vehiculos_con_placa,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de resolución de inferencia")
+    parser.add_argument('--videos', nargs='+', required=True)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--lados', type=int, nargs='+', default=[0, 1920, 1280, 960, 640],
+                        help="Lado mayor para detectar vehículos (0 = frame completo)")
+    args = parser.parse_args()
+
+    print(f"{'video':>24} {'entrada':>10} {'vehículos':>10} {'placas':>7} {'FPS':>7} "
+          f"{'placas det':>10} {'lectura %':>9} {'autos c/placa':>13}")
+
+    with tempfile.TemporaryDirectory() as carpeta_imagenes:
+        for ruta_video in args.videos:
+            cap = cv2.VideoCapture(ruta_video)
+            entrada = f"{int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))}"
+            cap.release()
+
+            for lado in args.lados:
+                for placas_en_roi in (False, True):
+                    politica = PoliticaResolucion(lado_vehiculos=lado or None, placas_en_roi=placas_en_roi)
+                    r = medir(ruta_video, politica, args.frames, carpeta_imagenes)
+                    if r is None:
+                        print(f"❌ No se pudo leer {ruta_video}")
+                        break
+                    print(f"{os.path.basename(ruta_video)[-24:]:>24} {entrada:>10} {lado or 'completo':>10} "
+                          f"{'roi' if placas_en_roi else 'frame':>7} {r['fps']:>7.2f} {r['placas']:>10} "
+                          f"{100 * r['tasa_lectura']:>9.1f} {r['vehiculos_con_placa']:>13}")
+
+
+if __name__ == "__main__":
+    main()
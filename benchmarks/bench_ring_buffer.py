@@ -0,0 +1,124 @@
+"""
+Benchmark: ring buffer en memoria compartida vs colas con frames serializados
+
+Un productor entrega frames a K consumidores (como el detector y los procesos
+de OCR de multiproceso.py). Cada consumidor toca un recorte del frame, así se
+mide el costo de mover los píxeles y no el de la inferencia.
+
+Uso:
+    python -m benchmarks.bench_ring_buffer
+    python -m benchmarks.bench_ring_buffer --alto 1080 --ancho 1920 --consumidores 4 --frames 500
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+
+from ring_buffer import FrameRingBuffer
+
+
+def _pico_rss_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def consumidor_cola(cola, resultados):
+    suma = 0
+    while True:
+        frame = cola.get()
+        if frame is None:
+            break
+        suma += int(frame[100:200, 100:400].mean())
+    resultados.put(_pico_rss_mb())
+
+
+def consumidor_ring(buffer, cola, resultados):
+    suma = 0
+    while True:
+        slot = cola.get()
+        if slot is None:
+            break
+        suma += int(buffer.vista(slot)[100:200, 100:400].mean())
+        buffer.liberar(slot)
+    buffer.cerrar()
+    resultados.put(_pico_rss_mb())
+
+
+def medir_colas(contexto, frame, num_frames, num_consumidores, max_en_vuelo):
+    colas = [contexto.Queue(maxsize=max_en_vuelo) for _ in range(num_consumidores)]
+    resultados = contexto.Queue()
+    procesos = [contexto.Process(target=consumidor_cola, args=(cola, resultados)) for cola in colas]
+    for proceso in procesos:
+        proceso.start()
+
+    inicio = time.perf_counter()
+    for n in range(num_frames):
+        frame[0, 0, 0] = n % 256
+        for cola in colas:
+            cola.put(frame)
+    for cola in colas:
+        cola.put(None)
+    picos = [resultados.get() for _ in procesos]
+    tiempo = time.perf_counter() - inicio
+
+    for proceso in procesos:
+        proceso.join()
+    return num_frames / tiempo, sum(picos)
+
+
+def medir_ring(contexto, frame, num_frames, num_consumidores, num_slots):
+    buffer = FrameRingBuffer.crear(num_slots, frame.shape, frame.dtype, contexto=contexto)
+    colas = [contexto.Queue() for _ in range(num_consumidores)]
+    resultados = contexto.Queue()
+    procesos = [contexto.Process(target=consumidor_ring, args=(buffer, cola, resultados)) for cola in colas]
+    for proceso in procesos:
+        proceso.start()
+
+    inicio = time.perf_counter()
+    for n in range(num_frames):
+        slot = buffer.adquirir()
+        vista = buffer.vista(slot)
+        # Equivalente a decodificar en el slot (cap.read(vista))
+        np.copyto(vista, frame)
+        vista[0, 0, 0] = n % 256
+        buffer.publicar(slot, num_consumidores)
+        for cola in colas:
+            cola.put(slot)
+    for cola in colas:
+        cola.put(None)
+    picos = [resultados.get() for _ in procesos]
+    tiempo = time.perf_counter() - inicio
+
+    for proceso in procesos:
+        proceso.join()
+    buffer.cerrar()
+    return num_frames / tiempo, sum(picos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ring buffer compartido vs colas serializadas")
+    parser.add_argument('--alto', type=int, default=2160)
+    parser.add_argument('--ancho', type=int, default=3840)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--consumidores', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--slots', type=int, default=8)
+    args = parser.parse_args()
+
+    contexto = multiprocessing.get_context('spawn')
+    frame = np.random.default_rng(0).integers(0, 255, size=(args.alto, args.ancho, 3), dtype=np.uint8)
+    mb_frame = frame.nbytes / 1e6
+
+    print(f"Frame {args.ancho}x{args.alto} ({mb_frame:.1f} MB), {args.frames} frames, "
+          f"{args.slots} slots ({args.slots * mb_frame:.0f} MB compartidos)")
+    print(f"{'consumidores':>12} {'modo':>8} {'frames/s':>9} {'MB/s entregados':>15} {'RSS pico hijos MB':>18}")
+    for num_consumidores in args.consumidores:
+        fps, rss = medir_colas(contexto, frame.copy(), args.frames, num_consumidores, args.slots)
+        print(f"{num_consumidores:>12} {'pickle':>8} {fps:>9.1f} {fps * mb_frame * num_consumidores:>15.0f} {rss:>18.0f}")
+        fps, rss = medir_ring(contexto, frame, args.frames, num_consumidores, args.slots)
+        print(f"{num_consumidores:>12} {'shm':>8} {fps:>9.1f} {fps * mb_frame * num_consumidores:>15.0f} {rss:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark de trackers: latencia de update vs número de objetos y cambios de ID
+
+Genera tráfico sintético denso (vehículos que se cruzan, oclusiones que bajan
+la confianza de la detección, detecciones perdidas y falsos positivos) y
+compara SORT con ByteTrack sobre la misma secuencia.
+
+Uso:
+    python -m benchmarks.bench_tracker
+    python -m benchmarks.bench_tracker --objetos 10 50 100 200 --frames 300
+"""
+import argparse
+import time
+
+import numpy as np
+
+from tracker import crear_tracker, asociar, iou_batch
+
+# Confianza por defecto de YOLO: main.py nunca ve detecciones por debajo con SORT
+CONF_YOLO = 0.25
+
+
+def generar_escena(num_objetos, num_frames, semilla=0, ancho=3840, alto=2160):
+    """Devolver por frame (cajas_gt Nx4, ids_gt N, detecciones Mx5)"""
+    rng = np.random.default_rng(semilla)
+
+    # Carriles horizontales en ambos sentidos para forzar cruces y oclusiones
+    tam = rng.uniform(120, 260, size=(num_objetos, 2))
+    pos = np.column_stack((rng.uniform(0, ancho, num_objetos), rng.uniform(0, alto, num_objetos)))
+    vel = np.column_stack((rng.choice([-1, 1], num_objetos) * rng.uniform(4, 14, num_objetos),
+                           rng.normal(0, 0.5, num_objetos)))
+
+    escena = []
+    for _ in range(num_frames):
+        pos = pos + vel
+        pos[:, 0] %= ancho
+        pos[:, 1] = np.clip(pos[:, 1], 0, alto)
+        cajas = np.column_stack((pos - tam / 2, pos + tam / 2))
+
+        # Oclusión: un objeto cubierto por otro más cercano (más abajo) pierde confianza
+        iou = iou_batch(cajas, cajas)
+        np.fill_diagonal(iou, 0)
+        delante = cajas[:, 3][None, :] > cajas[:, 3][:, None]
+        ocluido = np.any((iou > 0.15) & delante, axis=1)
+
+        scores = rng.uniform(0.6, 0.95, num_objetos)
+        scores[ocluido] = rng.uniform(0.12, 0.45, ocluido.sum())
+        visibles = rng.random(num_objetos) > 0.03
+
+        ruido = rng.normal(0, 3, size=cajas.shape)
+        dets = np.column_stack((cajas + ruido, scores))[visibles]
+
+        # Falsos positivos de baja confianza
+        num_falsos = rng.poisson(max(1, num_objetos // 20))
+        falsos_pos = np.column_stack((rng.uniform(0, ancho, num_falsos), rng.uniform(0, alto, num_falsos)))
+        falsos = np.column_stack((falsos_pos - 60, falsos_pos + 60, rng.uniform(0.1, 0.3, num_falsos)))
+
+        escena.append((cajas, np.arange(num_objetos), np.vstack((dets, falsos))))
+
+    return escena
+
+
+def evaluar(nombre, escena):
+    """Ejecutar un tracker sobre la escena y medir latencia e ID switches"""
+    tracker = crear_tracker(nombre)
+    ultimo_id = {}
+    ids_por_objeto = {}
+    id_switches = 0
+    tiempos = []
+
+    for cajas_gt, ids_gt, dets in escena:
+        if tracker.conf_deteccion is not None:
+            dets = dets[dets[:, 4] >= tracker.conf_deteccion]
+        else:
+            dets = dets[dets[:, 4] >= CONF_YOLO]
+
+        inicio = time.perf_counter()
+        tracks = tracker.update(dets)
+        tiempos.append(time.perf_counter() - inicio)
+
+        pares, _, _ = asociar(iou_batch(cajas_gt, tracks[:, :4]), 0.5)
+        for g, t in pares:
+            objeto, track_id = int(ids_gt[g]), int(tracks[t, 4])
+            if objeto in ultimo_id and ultimo_id[objeto] != track_id:
+                id_switches += 1
+            ultimo_id[objeto] = track_id
+            ids_por_objeto.setdefault(objeto, set()).add(track_id)
+
+    fragmentos = sum(len(ids) for ids in ids_por_objeto.values())
+    return {
+        'latencia_ms': 1000 * float(np.mean(tiempos)),
+        'p95_ms': 1000 * float(np.percentile(tiempos, 95)),
+        'id_switches': id_switches,
+        'ids_por_objeto': fragmentos / max(len(ids_por_objeto), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SORT vs ByteTrack")
+    parser.add_argument('--objetos', type=int, nargs='+', default=[10, 25, 50, 100, 200])
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'objetos':>8} {'tracker':>10} {'update ms':>10} {'p95 ms':>8} {'ID sw':>7} {'IDs/obj':>8}")
+    for num_objetos in args.objetos:
+        escena = generar_escena(num_objetos, args.frames, args.semilla)
+        for nombre in ('sort', 'bytetrack'):
+            r = evaluar(nombre, escena)
+            print(f"{num_objetos:>8} {nombre:>10} {r['latencia_ms']:>10.3f} {r['p95_ms']:>8.3f} "
+                  f"{r['id_switches']:>7} {r['ids_por_objeto']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Evaluación de precisión vs throughput de las configuraciones del pipeline
+
+Ejecuta main.py con cada configuración de una matriz sobre un conjunto de
+clips etiquetados y compara los vehículos emitidos (--eventos) con las placas
+reales. Así cada atajo de velocidad (resolución reducida, placas en ROI,
+otro tracker, más procesos...) se elige midiendo lo que cuesta en aciertos.
+
+Ground truth (CSV), una fila por vehículo; los frames son opcionales:
+    video,placa,primer_frame,ultimo_frame
+    clip_01.mp4,ABC123,0,240
+    clip_01.mp4,XYZ789,,
+
+Métricas por configuración (sumadas sobre los clips):
+- precisión y recall a nivel placa: placas distintas emitidas por clip vs placas reales
+- cambios de ID: tracks de más con el mismo texto sobre un mismo vehículo real
+- FPS: frames / tiempo de procesamiento de main.py, sin la carga de modelos
+  (que en los modos multiproceso se repite en cada proceso); la carga se
+  reporta aparte como segundos promedio por clip
+
+Uso:
+    python -m benchmarks.evaluar --gt gt.csv --clips clips/
+    python -m benchmarks.evaluar --gt gt.csv --clips clips/ --config base= --config roi960="--placas-roi --lado-vehiculos 960"
+"""
+import argparse
+import csv
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Nombre -> flags de main.py
+CONFIGURACIONES = {
+    'base': '',
+    'vehiculos_960': '--lado-vehiculos 960',
+    'vehiculos_640': '--lado-vehiculos 640',
+    'roi': '--placas-roi',
+    'roi_960': '--placas-roi --lado-vehiculos 960',
+    'bytetrack': '--tracker bytetrack',
+}
+
+EXTENSIONES_VIDEO = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def normalizar(texto):
+    return ''.join(c for c in str(texto).upper() if c.isalnum())
+
+
+def _entero(valor):
+    return int(valor) if valor not in (None, '') else None
+
+
+def cargar_gt(ruta):
+    """{nombre_video: [{'placa', 'primer_frame', 'ultimo_frame'}]}"""
+    gt = {}
+    with open(ruta, newline='', encoding='utf-8') as f:
+        for fila in csv.DictReader(f):
+            gt.setdefault(os.path.basename(fila['video']), []).append({
+                'placa': normalizar(fila['placa']),
+                'primer_frame': _entero(fila.get('primer_frame')),
+                'ultimo_frame': _entero(fila.get('ultimo_frame')),
+            })
+    return gt
+
+
+def listar_clips(rutas):
+    clips = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            clips += [os.path.join(ruta, nombre) for nombre in sorted(os.listdir(ruta))
+                      if nombre.lower().endswith(EXTENSIONES_VIDEO)]
+        else:
+            clips.append(ruta)
+    return clips
+
+
+def ejecutar(flags, ruta_video, carpeta, verbose=False):
+    """Correr main.py sobre un clip; devuelve (metricas, eventos) o None si falló"""
+    rutas = {nombre: os.path.join(carpeta, nombre)
+             for nombre in ('test.csv', 'eventos.jsonl', 'metricas.json', 'checkpoint.pkl', 'recortes')}
+    comando = [
+        sys.executable, 'main.py', '--video', os.path.abspath(ruta_video),
+        '--salida', rutas['test.csv'], '--eventos', rutas['eventos.jsonl'],
+        '--metricas', rutas['metricas.json'], '--checkpoint', rutas['checkpoint.pkl'],
+        '--checkpoint-cada', '0', '--almacen-recortes', rutas['recortes'],
+    ] + shlex.split(flags)
+
+    salida = None if verbose else subprocess.DEVNULL
+    proceso = subprocess.run(comando, cwd=RAIZ, stdout=salida, stderr=salida)
+    if proceso.returncode != 0 or not os.path.exists(rutas['metricas.json']):
+        return None
+
+    with open(rutas['metricas.json'], encoding='utf-8') as f:
+        metricas = json.load(f)
+    with open(rutas['eventos.jsonl'], encoding='utf-8') as f:
+        eventos = [json.loads(linea) for linea in f if linea.strip()]
+    return metricas, eventos
+
+
+def _solapan(evento, vehiculo):
+    if vehiculo['primer_frame'] is not None and evento['ultimo_frame'] < vehiculo['primer_frame']:
+        return False
+    if vehiculo['ultimo_frame'] is not None and evento['primer_frame'] > vehiculo['ultimo_frame']:
+        return False
+    return True
+
+
+def evaluar_clip(eventos, vehiculos, score_minimo=0.0):
+    """Comparar los eventos de un clip con su ground truth"""
+    emitidos = [e for e in eventos if e['consenso'] and e['consenso_score'] >= score_minimo]
+    placas_emitidas = {normalizar(e['consenso']) for e in emitidos}
+    placas_reales = {v['placa'] for v in vehiculos}
+
+    cambios_id = 0
+    for vehiculo in vehiculos:
+        tracks = [e for e in emitidos if normalizar(e['consenso']) == vehiculo['placa'] and _solapan(e, vehiculo)]
+        cambios_id += max(0, len(tracks) - 1)
+
+    return {
+        'aciertos': len(placas_emitidas & placas_reales),
+        'emitidas': len(placas_emitidas),
+        'reales': len(placas_reales),
+        'cambios_id': cambios_id,
+    }
+
+
+def frente_pareto(filas):
+    """Marcar las configuraciones no dominadas en (precisión, recall, FPS, -cambios de ID)"""
+    def objetivos(fila):
+        return (fila['precision'], fila['recall'], fila['fps'], -fila['cambios_id'])
+
+    for fila in filas:
+        a = objetivos(fila)
+        fila['pareto'] = not any(
+            all(x >= y for x, y in zip(objetivos(otra), a)) and objetivos(otra) != a
+            for otra in filas if otra is not fila
+        )
+    return filas
+
+
+def evaluar_configuracion(nombre, flags, clips, gt, score_minimo, verbose=False):
+    total = {'aciertos': 0, 'emitidas': 0, 'reales': 0, 'cambios_id': 0, 'frames': 0, 'segundos': 0.0,
+             'segundos_carga': 0.0}
+    fallidos = 0
+
+    for ruta_video in clips:
+        with tempfile.TemporaryDirectory() as carpeta:
+            resultado = ejecutar(flags, ruta_video, carpeta, verbose)
+        if resultado is None:
+            print(f"⚠️ {nombre}: falló main.py con {os.path.basename(ruta_video)}")
+            fallidos += 1
+            continue
+
+        metricas, eventos = resultado
+        for clave, valor in evaluar_clip(eventos, gt[os.path.basename(ruta_video)], score_minimo).items():
+            total[clave] += valor
+        total['frames'] += metricas['frames_corrida']
+        total['segundos'] += metricas['segundos']
+        total['segundos_carga'] += metricas['segundos_carga']
+
+    return {
+        'config': nombre,
+        'flags': flags,
+        'precision': total['aciertos'] / total['emitidas'] if total['emitidas'] else 0.0,
+        'recall': total['aciertos'] / total['reales'] if total['reales'] else 0.0,
+        'cambios_id': total['cambios_id'],
+        'fps': total['frames'] / total['segundos'] if total['segundos'] else 0.0,
+        'carga_s': total['segundos_carga'] / (len(clips) - fallidos) if len(clips) > fallidos else 0.0,
+        'fallidos': fallidos,
+    }
+
+
+def parse_config(texto):
+    nombre, _, flags = texto.partition('=')
+    return nombre.strip(), flags.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión vs throughput por configuración")
+    parser.add_argument('--gt', required=True, help="CSV con video,placa[,primer_frame,ultimo_frame]")
+    parser.add_argument('--clips', nargs='+', required=True, help="Videos o carpetas con los clips etiquetados")
+    parser.add_argument('--config', action='append', type=parse_config, default=[],
+                        help="nombre=\"flags de main.py\" (repetible; por defecto la matriz incluida)")
+    parser.add_argument('--score-minimo', type=float, default=0.0,
+                        help="Confianza mínima del consenso para contar una placa emitida")
+    parser.add_argument('--salida-csv', help="Guardar la tabla en CSV")
+    parser.add_argument('--verbose', action='store_true', help="Mostrar la salida de main.py")
+    args = parser.parse_args()
+
+    gt = cargar_gt(args.gt)
+    clips = [c for c in listar_clips(args.clips) if os.path.basename(c) in gt]
+    faltantes = set(gt) - {os.path.basename(c) for c in clips}
+    if faltantes:
+        print(f"⚠️ Clips del ground truth no encontrados: {sorted(faltantes)}")
+    if not clips:
+        print("❌ Ningún clip coincide con el ground truth")
+        return
+
+    configuraciones = args.config or list(CONFIGURACIONES.items())
+    print(f"🎯 {len(configuraciones)} configuraciones x {len(clips)} clips "
+          f"({sum(len(gt[os.path.basename(c)]) for c in clips)} vehículos etiquetados)")
+
+    filas = []
+    for nombre, flags in configuraciones:
+        fila = evaluar_configuracion(nombre, flags, clips, gt, args.score_minimo, args.verbose)
+        filas.append(fila)
+        print(f"✅ {nombre}: P={fila['precision']:.3f} R={fila['recall']:.3f} "
+              f"IDsw={fila['cambios_id']} {fila['fps']:.2f} FPS (carga {fila['carga_s']:.1f} s)")
+
+    filas = sorted(frente_pareto(filas), key=lambda f: -f['fps'])
+    print(f"\n{'':2}{'config':<16} {'FPS':>7} {'precisión':>9} {'recall':>7} {'F1':>6} {'cambios ID':>10}  flags")
+    for fila in filas:
+        suma = fila['precision'] + fila['recall']
+        fila['f1'] = 2 * fila['precision'] * fila['recall'] / suma if suma else 0.0
+        print(f"{'⭐' if fila['pareto'] else '  '}{fila['config']:<16} {fila['fps']:>7.2f} {fila['precision']:>9.3f} "
+              f"{fila['recall']:>7.3f} {fila['f1']:>6.3f} {fila['cambios_id']:>10}  {fila['flags']}")
+    print("⭐ = frente de Pareto (ninguna otra configuración es mejor o igual en todo)")
+
+    if args.salida_csv:
+        campos = ['config', 'flags', 'fps', 'carga_s', 'precision', 'recall', 'f1', 'cambios_id', 'pareto', 'fallidos']
+        with open(args.salida_csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=campos)
+            writer.writeheader()
+            writer.writerows(filas)
+        print(f"💾 Tabla guardada en {args.salida_csv}")
+
+
+if __name__ == "__main__":
+    main()
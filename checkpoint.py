@@ -0,0 +1,60 @@
+"""
+Checkpoints periódicos para reanudar trabajos largos de detección
+
+Un checkpoint guarda el último frame procesado, el estado del tracker (filtros
+de Kalman y contador de IDs incluidos), las lecturas OCR por vehículo y el
+tamaño del CSV ya escrito. Se escribe en un archivo temporal y se reemplaza
+de forma atómica, así un corte a mitad de escritura nunca deja un checkpoint
+corrupto.
+"""
+import os
+import pickle
+
+import cv2
+
+VERSION_CHECKPOINT = 1
+
+
+def guardar_checkpoint(ruta, estado):
+    """Guardar el estado de forma atómica; devuelve el tamaño en bytes"""
+    estado = dict(estado, version=VERSION_CHECKPOINT)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        pickle.dump(estado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+    return os.path.getsize(ruta)
+
+
+def cargar_checkpoint(ruta):
+    """Cargar un checkpoint guardado con guardar_checkpoint"""
+    with open(ruta, 'rb') as f:
+        estado = pickle.load(f)
+
+    if estado.get('version') != VERSION_CHECKPOINT:
+        raise ValueError(f"Versión de checkpoint no soportada: {estado.get('version')}")
+    return estado
+
+
+def abrir_en_frame(ruta_video, frame_nmr):
+    """Abrir el video posicionado en `frame_nmr` para reanudar
+
+    cap.set no avisa cuando el contenedor no permite buscar (streams MJPEG o
+    .ts que crecen): la lectura seguiría desde el frame 0 con la numeración del
+    checkpoint. Si la posición no coincide se reabre el video y se avanza con
+    grab() hasta el frame; si el video es más corto se lanza ValueError.
+    """
+    cap = cv2.VideoCapture(ruta_video)
+    if frame_nmr == 0:
+        return cap
+    if cap.set(cv2.CAP_PROP_POS_FRAMES, frame_nmr) and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_nmr:
+        return cap
+
+    cap.release()
+    cap = cv2.VideoCapture(ruta_video)
+    for n in range(frame_nmr):
+        if not cap.grab():
+            cap.release()
+            raise ValueError(f"El video termina en el frame {n}, antes del frame {frame_nmr} del checkpoint")
+    return cap
@@ -0,0 +1,170 @@
+"""
+Eventos por vehículo: un registro JSON por track, emitido cuando el tracker lo retira
+
+Cada registro resume el track completo (primer y último frame, mejor lectura,
+consenso, referencia al mejor recorte y trayectoria), de modo que los
+consumidores no necesitan recorrer todas las filas por frame del CSV. El
+archivo se escribe línea a línea y se vacía en cada evento para poder
+consumirlo en tiempo real.
+"""
+import json
+import os
+
+from util import license_consensus
+
+# Puntos máximos de la trayectoria muestreada en cada evento
+MAX_PUNTOS_TRAYECTORIA = 32
+
+
+def _centro(bbox):
+    x1, y1, x2, y2 = bbox[:4]
+    return [round((x1 + x2) / 2, 1), round((y1 + y2) / 2, 1)]
+
+
+class EventosVehiculo:
+    """Acumular el resumen de cada track activo y escribirlo al retirarse"""
+
+    def __init__(self, ruta, ref_recorte=None, offset=None):
+        """`ref_recorte(frame_nmr, car_id)` devuelve la referencia al recorte guardado
+
+        Con `offset` se reanuda un archivo existente descartando lo escrito después.
+        """
+        self.ruta = ruta
+        self.ref_recorte = ref_recorte
+        self.activos = {}
+        self.emitidos = 0
+
+        if offset is not None and os.path.exists(ruta):
+            self.f = open(ruta, 'r+', encoding='utf-8')
+            self.f.truncate(offset)
+            self.f.seek(offset)
+        else:
+            self.f = open(ruta, 'w', encoding='utf-8')
+
+    def estado(self):
+        self.f.flush()
+        return {'activos': self.activos, 'offset': self.f.tell(), 'emitidos': self.emitidos}
+
+    def restaurar(self, estado):
+        self.activos = estado['activos']
+        self.emitidos = estado['emitidos']
+
+    def actualizar(self, frame_nmr, track_ids, frame_results):
+        """Registrar las cajas de los tracks y las lecturas de placa de un frame"""
+        for track in track_ids:
+            car_id = int(track[4])
+            bbox = [float(v) for v in track[:4]]
+            resumen = self.activos.get(car_id)
+            if resumen is None:
+                resumen = self.activos[car_id] = {
+                    'primer_frame': frame_nmr,
+                    'primer_bbox': bbox,
+                    'frames_visibles': 0,
+                    'recorrido': 0.0,
+                    'puntos': [],
+                    'paso': 1,
+                    'lecturas': [],
+                    'frames_con_placa': 0,
+                    'mejor': None,
+                }
+            else:
+                (cx, cy), (px, py) = _centro(bbox), _centro(resumen['ultimo_bbox'])
+                resumen['recorrido'] += ((cx - px) ** 2 + (cy - py) ** 2) ** 0.5
+
+            resumen['ultimo_frame'] = frame_nmr
+            resumen['ultimo_bbox'] = bbox
+            resumen['frames_visibles'] += 1
+
+            # Trayectoria muestreada: al llenarse se descarta un punto de cada dos
+            if (resumen['frames_visibles'] - 1) % resumen['paso'] == 0:
+                resumen['puntos'].append([frame_nmr] + _centro(bbox))
+                if len(resumen['puntos']) > MAX_PUNTOS_TRAYECTORIA:
+                    resumen['puntos'] = resumen['puntos'][::2]
+                    resumen['paso'] *= 2
+
+        for car_id, datos in frame_results.items():
+            resumen = self.activos.get(car_id)
+            if resumen is None:
+                continue
+
+            lp = datos['license_plate']
+            resumen['frames_con_placa'] += 1
+            leida = lp['text'] not in ['UNKNOWN', 'NO_OCR', '']
+            if leida:
+                resumen['lecturas'].append((lp['text'], float(lp['text_score'])))
+
+            # Mejor recorte: mayor confianza OCR; sin lecturas, mayor confianza de detección
+            clave = (leida, float(lp['text_score'] if leida else lp['bbox_score']))
+            if resumen['mejor'] is None or clave > resumen['mejor']['clave']:
+                resumen['mejor'] = {
+                    'clave': clave,
+                    'frame_nmr': frame_nmr,
+                    'texto': lp['text'],
+                    'score': float(lp['text_score']),
+                    'bbox': [float(v) for v in lp['bbox']],
+                }
+
+    def retirar(self, frame_nmr, ids_activos):
+        """Emitir los tracks que el tracker ya no mantiene"""
+        for car_id in [c for c in self.activos if c not in ids_activos]:
+            self._emitir(car_id, frame_nmr)
+        self.f.flush()
+
+    def cerrar(self, frame_nmr=None):
+        """Emitir todos los tracks pendientes (fin del video) y cerrar el archivo"""
+        for car_id in list(self.activos):
+            self._emitir(car_id, frame_nmr)
+        self.f.close()
+
+    def _emitir(self, car_id, frame_retiro):
+        resumen = self.activos.pop(car_id)
+        consenso, consenso_score = license_consensus(resumen['lecturas'])
+        mejor = resumen['mejor']
+
+        mejor_recorte = None
+        if mejor is not None:
+            mejor_recorte = {'frame_nmr': mejor['frame_nmr'], 'bbox': mejor['bbox']}
+            if self.ref_recorte is not None:
+                mejor_recorte['ref'] = self.ref_recorte(mejor['frame_nmr'], car_id)
+
+        duracion = max(resumen['ultimo_frame'] - resumen['primer_frame'], 1)
+        evento = {
+            'car_id': car_id,
+            'primer_frame': resumen['primer_frame'],
+            'ultimo_frame': resumen['ultimo_frame'],
+            'frame_retiro': frame_retiro,
+            'frames_visibles': resumen['frames_visibles'],
+            'frames_con_placa': resumen['frames_con_placa'],
+            'mejor_placa': mejor['texto'] if mejor and mejor['clave'][0] else None,
+            'mejor_score': mejor['score'] if mejor and mejor['clave'][0] else 0.0,
+            'consenso': consenso,
+            'consenso_score': consenso_score,
+            'lecturas': len(resumen['lecturas']),
+            'mejor_recorte': mejor_recorte,
+            'trayectoria': {
+                'primer_bbox': resumen['primer_bbox'],
+                'ultimo_bbox': resumen['ultimo_bbox'],
+                'desplazamiento': [round(b - a, 1) for a, b in zip(_centro(resumen['primer_bbox']),
+                                                                   _centro(resumen['ultimo_bbox']))],
+                'recorrido': round(resumen['recorrido'], 1),
+                'velocidad_px_frame': round(resumen['recorrido'] / duracion, 2),
+                'puntos': resumen['puntos'],
+            },
+        }
+        self.f.write(json.dumps(evento, ensure_ascii=False) + '\n')
+        self.emitidos += 1
+
+
+def eventos_desde_resultados(ruta, results, ref_recorte=None):
+    """Generar eventos a partir de resultados por frame ya completos (modo por segmentos)
+
+    Solo se conocen los frames con placa, así que la trayectoria se basa en ellos.
+    """
+    eventos = EventosVehiculo(ruta, ref_recorte=ref_recorte)
+    for frame_nmr in sorted(results):
+        cars = results[frame_nmr]
+        track_ids = [list(datos['car']['bbox']) + [car_id] for car_id, datos in cars.items()]
+        eventos.actualizar(frame_nmr, track_ids, cars)
+    emitidos = len(eventos.activos)
+    eventos.cerrar()
+    return emitidos
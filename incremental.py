@@ -0,0 +1,296 @@
+"""
+Procesamiento incremental: solo el material nuevo de cada video
+
+Un manifiesto guarda por video su huella de contenido (tamaño y hash del
+primer y del último MB procesado), los frames ya procesados y dónde terminó
+cada salida. En cada corrida cada video se clasifica como:
+
+- nuevo o modificado: se procesa completo con salidas nuevas
+- crecido (misma huella hasta el tamaño anterior): main.py --resume continúa
+  desde el checkpoint final con los mismos car_id y extiende test.csv, los
+  eventos y el almacén de recortes; la interpolación solo agrega las filas
+  nuevas de los vehículos que siguen activos
+- sin cambios: se omite
+
+Cada video tiene su carpeta de salidas dentro de la carpeta incremental:
+    incremental/manifiesto.json
+    incremental/<video>_<hash>/test.csv, test_interpolated.csv, eventos.jsonl,
+                               checkpoint.pkl, recortes/
+
+Uso:
+    python incremental.py --videos grabaciones/
+    python incremental.py --videos camara1.ts camara2.ts --flags-main="--tracker bytetrack"
+
+--flags-main va con '=': su valor empieza con '--' y argparse lo tomaría
+como otra opción.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+
+from add_missing_data import header as CSV_INTERPOLADO, interpolate_bounding_boxes
+from checkpoint import cargar_checkpoint
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+CARPETA_INCREMENTAL = 'incremental'
+MANIFIESTO = 'manifiesto.json'
+BYTES_HUELLA = 1 << 20
+EXTENSIONES_VIDEO = ('.mp4', '.avi', '.mov', '.mkv', '.ts')
+
+# Modos sin checkpoint: no pueden continuar un video que creció
+FLAGS_SIN_RESUME = ('--workers', '--procesos-ocr')
+
+
+def _sha1_rango(ruta, desde, hasta):
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as f:
+        f.seek(desde)
+        h.update(f.read(max(0, hasta - desde)))
+    return h.hexdigest()
+
+
+def huella(ruta, tamano=None):
+    """Huella de contenido de los primeros `tamano` bytes (por defecto todo el archivo)"""
+    tamano = os.path.getsize(ruta) if tamano is None else tamano
+    return {
+        'tamano': tamano,
+        'inicio': _sha1_rango(ruta, 0, min(tamano, BYTES_HUELLA)),
+        'cola': _sha1_rango(ruta, max(0, tamano - BYTES_HUELLA), tamano),
+    }
+
+
+def clasificar(ruta_video, entrada):
+    """'nuevo', 'sin_cambios', 'crecido' o 'modificado' respecto del manifiesto"""
+    if entrada is None:
+        return 'nuevo'
+
+    anterior = entrada['huella']
+    tamano = os.path.getsize(ruta_video)
+    if tamano < anterior['tamano']:
+        return 'modificado'
+    # Mismos bytes hasta el tamaño anterior: el archivo solo se extendió
+    if huella(ruta_video, anterior['tamano']) != anterior:
+        return 'modificado'
+    return 'sin_cambios' if tamano == anterior['tamano'] else 'crecido'
+
+
+def carpeta_de(raiz, ruta_video):
+    nombre = os.path.splitext(os.path.basename(ruta_video))[0]
+    return os.path.join(raiz, f"{nombre}_{hashlib.sha1(ruta_video.encode('utf-8')).hexdigest()[:8]}")
+
+
+def cargar_manifiesto(raiz):
+    ruta = os.path.join(raiz, MANIFIESTO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def guardar_manifiesto(raiz, manifiesto):
+    """Reemplazo atómico, como los checkpoints"""
+    ruta = os.path.join(raiz, MANIFIESTO)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def interpolar_nuevas_filas(ruta_csv, offset, ruta_interpolado, ultimas_filas):
+    """Agregar al CSV interpolado las filas derivadas de las detecciones nuevas
+
+    Las filas nuevas empiezan en `offset` de test.csv. Para cada vehículo se
+    interpola desde su última fila anterior (`ultimas_filas`) y solo se agregan
+    los frames posteriores, que son los únicos que cambian. Con offset 0 se
+    reescribe el archivo completo. Devuelve (filas_agregadas, ultimas_filas).
+    """
+    with open(ruta_csv, newline='', encoding='utf-8') as f:
+        encabezado = next(csv.reader(f))
+        if offset > 0:
+            f.seek(offset)
+        nuevas = list(csv.DictReader(f, fieldnames=encabezado))
+
+    por_auto = {}
+    for fila in nuevas:
+        por_auto.setdefault(int(float(fila['car_id'])), []).append(fila)
+
+    agregadas = []
+    ultimas_filas = dict(ultimas_filas)
+    for car_id, filas in por_auto.items():
+        filas.sort(key=lambda fila: int(fila['frame_nmr']))
+        anterior = ultimas_filas.get(str(car_id))
+        datos = ([anterior] if anterior else []) + filas
+        desde = int(anterior['frame_nmr']) if anterior else -1
+        agregadas += [fila for fila in interpolate_bounding_boxes(datos) if int(fila['frame_nmr']) > desde]
+        ultimas_filas[str(car_id)] = filas[-1]
+
+    modo = 'a' if offset > 0 and os.path.exists(ruta_interpolado) else 'w'
+    with open(ruta_interpolado, modo, newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_INTERPOLADO)
+        if modo == 'w':
+            writer.writeheader()
+        writer.writerows(agregadas)
+
+    return len(agregadas), ultimas_filas
+
+
+def procesar_video(ruta_video, carpeta, entrada, estado, flags_main):
+    """Correr main.py (completo o --resume) y extender la interpolación
+
+    Devuelve la entrada nueva del manifiesto, o None si el video creció menos
+    de un frame decodificable (no hay nada nuevo que agregar).
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    # main.py corre desde la raíz del repositorio: las rutas no pueden ser relativas
+    rutas = {nombre: os.path.abspath(os.path.join(carpeta, nombre))
+             for nombre in ('test.csv', 'test_interpolated.csv', 'eventos.jsonl', 'checkpoint.pkl', 'recortes')}
+    continuar = estado == 'crecido'
+
+    comando = [
+        sys.executable, 'main.py', '--video', ruta_video,
+        '--salida', rutas['test.csv'], '--eventos', rutas['eventos.jsonl'],
+        '--checkpoint', rutas['checkpoint.pkl'], '--checkpoint-final', '--almacen-recortes', rutas['recortes'],
+    ] + (['--resume'] if continuar else []) + flags_main
+
+    frame_anterior = entrada['frames'] if continuar else 0
+    # Copia del checkpoint del manifiesto: si la reanudación falla, la próxima
+    # corrida vuelve a partir de él (recorta CSV, eventos y almacén a ese punto)
+    respaldo = rutas['checkpoint.pkl'] + '.anterior'
+    if continuar:
+        shutil.copy2(rutas['checkpoint.pkl'], respaldo)
+
+    inicio = time.time()
+    if subprocess.run(comando, cwd=RAIZ).returncode != 0:
+        if continuar:
+            os.replace(respaldo, rutas['checkpoint.pkl'])
+        raise RuntimeError(f"main.py falló con {ruta_video}")
+
+    checkpoint = cargar_checkpoint(rutas['checkpoint.pkl'])
+    frames = checkpoint['frame_nmr'] + 1
+    if continuar and checkpoint.get('primer_frame_corrida') != frame_anterior:
+        # Una reanudación que no empezó donde terminó la anterior numeró mal los frames
+        os.replace(respaldo, rutas['checkpoint.pkl'])
+        raise RuntimeError(f"main.py no reanudó {ruta_video} en el frame {frame_anterior} "
+                           f"(empezó en {checkpoint.get('primer_frame_corrida')})")
+    if continuar:
+        os.remove(respaldo)
+    if continuar and frames <= frame_anterior:
+        return None
+
+    # Solo los vehículos que el tracker sigue manteniendo pueden recibir filas nuevas
+    offset = entrada['csv_offset'] if continuar else 0
+    filas, ultimas_filas = interpolar_nuevas_filas(
+        rutas['test.csv'], offset, rutas['test_interpolated.csv'],
+        entrada['ultimas_filas'] if continuar else {}
+    )
+    activos = {str(car_id) for car_id in checkpoint['procesador']['tracker'].ids_activos()}
+    ultimas_filas = {car_id: fila for car_id, fila in ultimas_filas.items() if car_id in activos}
+
+    return {
+        'ruta': ruta_video,
+        'carpeta': carpeta,
+        'huella': huella(ruta_video),
+        'frames': frames,
+        'csv_offset': os.path.getsize(rutas['test.csv']),
+        'ultimas_filas': ultimas_filas,
+        'actualizado': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'ultima_corrida': {
+            'frames_nuevos': frames - frame_anterior,
+            'filas_interpoladas': filas,
+            'segundos': round(time.time() - inicio, 1),
+        },
+    }
+
+
+def listar_videos(rutas):
+    videos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            videos += [os.path.join(ruta, nombre) for nombre in sorted(os.listdir(ruta))
+                       if nombre.lower().endswith(EXTENSIONES_VIDEO)]
+        else:
+            videos.append(ruta)
+    return [os.path.abspath(video) for video in videos]
+
+
+def procesar_incremental(videos, raiz=CARPETA_INCREMENTAL, flags_main=()):
+    """Procesar solo lo nuevo de cada video; devuelve {estado: cantidad de videos}"""
+    os.makedirs(raiz, exist_ok=True)
+    manifiesto = cargar_manifiesto(raiz)
+    resumen = {}
+
+    for ruta_video in videos:
+        entrada = manifiesto.get(ruta_video)
+        estado = clasificar(ruta_video, entrada)
+
+        if estado == 'sin_cambios':
+            resumen[estado] = resumen.get(estado, 0) + 1
+            print(f"⏭️ {os.path.basename(ruta_video)}: sin cambios ({entrada['frames']} frames)")
+            continue
+
+        print(f"{'⏩' if estado == 'crecido' else '🆕'} {os.path.basename(ruta_video)}: {estado}")
+        carpeta = entrada['carpeta'] if entrada else carpeta_de(raiz, ruta_video)
+        try:
+            nueva = procesar_video(ruta_video, carpeta, entrada, estado, list(flags_main))
+        except (RuntimeError, OSError, ValueError) as e:
+            print(f"❌ {e}")
+            resumen[estado] = resumen.get(estado, 0) + 1
+            resumen['error'] = resumen.get('error', 0) + 1
+            continue
+
+        if nueva is None:
+            # Solo se agregó un frame incompleto: se conserva la entrada con la huella
+            # actual y la próxima corrida continúa desde el mismo checkpoint
+            estado = 'sin_cambios'
+            manifiesto[ruta_video] = dict(entrada, huella=huella(ruta_video))
+        else:
+            manifiesto[ruta_video] = nueva
+        resumen[estado] = resumen.get(estado, 0) + 1
+
+        # Guardar después de cada video: un corte no obliga a repetir los anteriores
+        guardar_manifiesto(raiz, manifiesto)
+        if nueva is None:
+            print(f"⏭️ {os.path.basename(ruta_video)}: sin frames nuevos completos ({entrada['frames']} frames)")
+            continue
+        corrida = nueva['ultima_corrida']
+        print(f"✅ {os.path.basename(ruta_video)}: {corrida['frames_nuevos']} frames nuevos, "
+              f"{corrida['filas_interpoladas']} filas interpoladas en {corrida['segundos']} s")
+
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Procesar solo los videos nuevos o los frames agregados")
+    parser.add_argument('--videos', nargs='+', required=True, help="Videos o carpetas con segmentos")
+    parser.add_argument('--carpeta', default=CARPETA_INCREMENTAL, help="Carpeta del manifiesto y las salidas")
+    parser.add_argument('--flags-main', default='',
+                        help="Flags adicionales para main.py, con '=' (ej. --flags-main=\"--placas-roi\")")
+    args = parser.parse_args()
+
+    flags_main = shlex.split(args.flags_main)
+    if any(flag.split('=')[0] in FLAGS_SIN_RESUME for flag in flags_main):
+        print(f"❌ {', '.join(FLAGS_SIN_RESUME)} no guardan checkpoint y no permiten continuar videos que crecen")
+        sys.exit(1)
+
+    videos = listar_videos(args.videos)
+    if not videos:
+        print("❌ No se encontraron videos")
+        sys.exit(1)
+
+    resumen = procesar_incremental(videos, args.carpeta, flags_main)
+    print(f"\n📊 {len(videos)} videos: " + ", ".join(f"{cantidad} {estado}" for estado, cantidad in resumen.items()))
+    if resumen.get('error'):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,136 +1,395 @@
-from ultralytics import YOLO
+import recursos
+
+# Antes de numpy/cv2/torch: sus pools de hilos se dimensionan al cargarse
+recursos.preparar_entorno()
+
+import argparse
+import csv
 import cv2
-import numpy as np
+import json
 import os
+import sys
+import time
+
+from almacen_recortes import CARPETA_ALMACEN
+from tracker import TRACKERS
+
+# util crea el lector de EasyOCR al importarse: se cuenta como carga de modelos
+_inicio_carga = time.perf_counter()
+from util import CSV_HEADER, write_csv, write_csv_rows, license_consensus
+CARGA_OCR = time.perf_counter() - _inicio_carga
+
+RUTA_CSV = './test.csv'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Detección de vehículos y placas con OCR")
+    parser.add_argument('--video', help="Ruta del video (si se omite se pregunta por consola)")
+    parser.add_argument('--watchlist', help="Archivo con placas vigiladas (una por línea, opcional 'PLACA,nota')")
+    parser.add_argument('--watchlist-sink', action='append', default=[],
+                        help="Destino de alertas: print, file:ruta, udp:host:puerto o unix:ruta (repetible)")
+    parser.add_argument('--watchlist-umbral', type=float, default=1.0,
+                        help="Distancia máxima en ediciones (una confusión OCR cuenta 0.25)")
+    parser.add_argument('--tracker', choices=list(TRACKERS), default='sort',
+                        help="Algoritmo de seguimiento de vehículos")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesar el video en N segmentos de tiempo en paralelo")
+    parser.add_argument('--solape', type=int, default=30,
+                        help="Frames de solape entre segmentos para coser los tracks")
+    parser.add_argument('--lado-vehiculos', type=int, default=None,
+                        help="Lado mayor del frame reducido para detectar vehículos (por defecto frame completo)")
+    parser.add_argument('--placas-roi', action='store_true',
+                        help="Detectar placas en recortes a resolución completa de cada vehículo")
+    parser.add_argument('--lado-placas', type=int, default=640,
+                        help="Tamaño de entrada (imgsz) del detector de placas")
+    parser.add_argument('--procesos-ocr', type=int, default=0,
+                        help="Detector y N procesos de OCR sobre un ring buffer en memoria compartida")
+    parser.add_argument('--slots', type=int, default=8,
+                        help="Frames en el ring buffer de memoria compartida")
+    parser.add_argument('--nucleos', type=int, default=None,
+                        help="Núcleos de CPU a repartir entre los procesos (por defecto todos los disponibles, "
+                             "divididos entre las instancias de main.py ya en ejecución)")
+    parser.add_argument('--checkpoint', default='./checkpoint.pkl',
+                        help="Archivo de checkpoint para reanudar el procesamiento")
+    parser.add_argument('--checkpoint-cada', type=int, default=1000,
+                        help="Guardar checkpoint cada N frames y al terminar (0 = desactivado)")
+    parser.add_argument('--checkpoint-final', action='store_true',
+                        help="Guardar un checkpoint al terminar aunque --checkpoint-cada sea 0 "
+                             "(para continuar el video si crece)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reanudar desde el checkpoint con los mismos car_id")
+    parser.add_argument('--almacen-recortes', nargs='?', const=CARPETA_ALMACEN, default=None, metavar='CARPETA',
+                        help=f"Guardar los recortes en un almacén indexado (por defecto {CARPETA_ALMACEN}) "
+                             "en lugar de un JPEG por placa")
+    parser.add_argument('--salida', default=RUTA_CSV, help="Ruta del CSV de resultados")
+    parser.add_argument('--metricas',
+                        help="Guardar un JSON con frames, tiempo y detecciones (para benchmarks.evaluar)")
+    parser.add_argument('--eventos',
+                        help="Archivo JSONL con un evento por vehículo, escrito al retirarse su track")
+    return parser.parse_args()
+
 
-from sort.sort import Sort
-from util import get_car, write_csv, read_license_plate
-
-# Crear carpeta "imagenes" si no existe
-os.makedirs("imagenes", exist_ok=True)
-
-results = {}
-mot_tracker = Sort()
-
-# Cargar modelos
-coco_model = YOLO('yolo11n.pt')
-license_plate_detector = YOLO('license_plate_detector.pt')
-
-# Cargar video
-ruta_video = input("👉 Ingresa la ruta o nombre del archivo de video: ")
-cap = cv2.VideoCapture(ruta_video)
-
-# Clases de vehículos en COCO: car, motorcycle, bus, truck
-vehicles = [2, 3, 5, 7]
-
-# Procesar frames
-frame_nmr = -1
-ret = True
-
-print("🚀 Iniciando procesamiento...")
-
-while ret:
-    frame_nmr += 1
-    ret, frame = cap.read()
-    
-    if ret:
-        results[frame_nmr] = {}
-        
-        # Detectar vehículos
-        detections = coco_model(frame)[0]
-        detections_ = []
-        num_vehiculos = 0
-        
-        if detections.boxes is not None:
-            for detection in detections.boxes.data.tolist():
-                x1, y1, x2, y2, score, class_id = detection
-                if int(class_id) in vehicles:
-                    detections_.append([x1, y1, x2, y2, score])
-                    num_vehiculos += 1
-
-        print(f"🟩 Frame {frame_nmr}: Vehículos detectados = {num_vehiculos}")
-
-        # Rastrear vehículos
-        if len(detections_) == 0:
-            detections_ = np.empty((0, 5))
-        track_ids = mot_tracker.update(np.asarray(detections_))
-
-        # Detectar placas
-        license_plates = license_plate_detector(frame)[0]
-        num_placas = 0
-        
-        if license_plates.boxes is not None:
-            for license_plate in license_plates.boxes.data.tolist():
-                num_placas += 1
-                x1, y1, x2, y2, score, class_id = license_plate
-
-                # Asignar placa a vehículo
-                xcar1, ycar1, xcar2, ycar2, car_id = get_car(license_plate, track_ids)
-
-                if car_id != -1:
-                    # Recortar placa
-                    license_plate_crop = frame[int(y1):int(y2), int(x1):int(x2), :]
-                    
-                    # Guardar imagen de placa
-                    try:
-                        nombre_imagen = f"imagenes/placa_frame{frame_nmr}_car{int(car_id)}.jpg"
-                        cv2.imwrite(nombre_imagen, license_plate_crop)
-                        print(f"💾 Placa guardada: {nombre_imagen}")
-                    except Exception as e:
-                        print(f"⚠️ Error al guardar imagen: {e}")
-
-                    # Leer texto de placa con OCR
-                    license_text, text_score = read_license_plate(license_plate_crop)
-
-                    # Guardar resultados
-                    if license_text is not None:
-                        results[frame_nmr][int(car_id)] = {
-                            'car': {'bbox': [xcar1, ycar1, xcar2, ycar2]},
-                            'license_plate': {
-                                'bbox': [x1, y1, x2, y2],
-                                'text': license_text,
-                                'bbox_score': score,
-                                'text_score': text_score
-                            }
-                        }
-                        print(f"✅ Placa leída: {license_text} (Confianza: {text_score:.2f})")
-                    else:
-                        results[frame_nmr][int(car_id)] = {
-                            'car': {'bbox': [xcar1, ycar1, xcar2, ycar2]},
-                            'license_plate': {
-                                'bbox': [x1, y1, x2, y2],
-                                'text': 'UNKNOWN',
-                                'bbox_score': score,
-                                'text_score': 0.0
-                            }
-                        }
-                        print(f"⚠️ No se pudo leer placa en Frame {frame_nmr}, Car ID {int(car_id)}")
-
-        print(f"🟦 Frame {frame_nmr}: Placas detectadas = {num_placas}")
-
-# Estadísticas finales
-print(f"\n📊 Procesamiento completado")
-print(f"📈 Total de frames procesados: {frame_nmr + 1}")
-
-total_detections = sum(len(results[f]) for f in results)
-print(f"📋 Total de detecciones: {total_detections}")
-
-# Contar placas leídas exitosamente
-ocr_success = 0
-for frame in results.values():
-    for car_data in frame.values():
+def contar_exitos_ocr(cars):
+    """Cantidad de placas leídas exitosamente en los resultados de un frame"""
+    ocr_success = 0
+    for car_data in cars.values():
         if 'license_plate' in car_data:
             text = car_data['license_plate']['text']
             if text not in ['UNKNOWN', 'NO_OCR', '']:
                 ocr_success += 1
+    return ocr_success
+
+
+def repartir_cpu(args):
+    """Dividir el presupuesto de núcleos entre los procesos del modo elegido"""
+    instancias = recursos.registrar_instancia()
+    nucleos = args.nucleos
+    if nucleos is None:
+        disponibles = recursos.nucleos_disponibles()
+        # Las instancias que ya corren no se reducen: esta toma solo su parte
+        nucleos = recursos.hilos_por_proceso(disponibles, instancias)
+        if instancias > 1:
+            print(f"⚠️ Hay otras {instancias - 1} instancias de main.py en ejecución: se usan {nucleos} de "
+                  f"{disponibles} núcleos (las anteriores no se ajustan; usar --nucleos para un reparto fijo)")
+    if args.workers > 1:
+        procesos, rol = args.workers, 'worker'
+    elif args.procesos_ocr > 0:
+        procesos, rol = 1 + args.procesos_ocr, 'proceso'
+    else:
+        procesos, rol = 1, 'proceso'
+
+    args.hilos = recursos.hilos_por_proceso(nucleos, procesos)
+    reparto = recursos.configurar_hilos(args.hilos)
+    print(recursos.describir_reparto(nucleos, procesos, args.hilos, reparto, rol))
+
+
+def crear_politica(args):
+    from pipeline import PoliticaResolucion
+
+    return PoliticaResolucion(lado_vehiculos=args.lado_vehiculos, placas_en_roi=args.placas_roi,
+                              lado_placas=args.lado_placas)
+
+
+def opciones_procesador(args):
+    """Opciones de ProcesadorPlacas para los modos en varios procesos"""
+    opciones = {'tracker': args.tracker, 'politica': crear_politica(args), 'hilos': args.hilos}
+    if args.almacen_recortes:
+        opciones['carpeta_recortes'] = args.almacen_recortes
+    return opciones
+
+
+def ref_recorte(args):
+    """Función (frame_nmr, car_id) -> referencia del recorte guardado"""
+    from almacen_recortes import referencia_recorte
+    from pipeline import PLANTILLA_IMAGEN
+
+    if args.almacen_recortes:
+        return lambda frame, car: referencia_recorte(args.almacen_recortes, frame, car)
+    return lambda frame, car: PLANTILLA_IMAGEN.format(frame=frame, car=car)
+
+
+def crear_eventos(args, offset=None):
+    from eventos import EventosVehiculo
+
+    return EventosVehiculo(args.eventos, offset=offset, ref_recorte=ref_recorte(args))
+
+
+def procesar_con_checkpoints(args, ruta_video, watchlist_matcher):
+    """Procesar en un solo proceso escribiendo el CSV (y los eventos) de forma incremental
+
+    Devuelve (frames_procesados, estadisticas, tiempos) o None si no se pudo
+    reanudar; `tiempos` separa la carga del modelo del procesamiento de frames
+    y 'frames' cuenta solo los frames de esta corrida (tras --resume no
+    incluye los anteriores al checkpoint).
+    """
+    inicio_carga = time.perf_counter()
+    from almacen_recortes import AlmacenRecortes
+    from checkpoint import abrir_en_frame, guardar_checkpoint, cargar_checkpoint
+    from pipeline import ProcesadorPlacas
+
+    procesador = ProcesadorPlacas(tracker=args.tracker, watchlist_matcher=watchlist_matcher,
+                                  politica=crear_politica(args))
+    estadisticas = {'total_detections': 0, 'ocr_success': 0}
+    frame_nmr = 0
+    eventos = None
+    almacen = None
+
+    if args.resume:
+        try:
+            estado = cargar_checkpoint(args.checkpoint)
+        except (OSError, ValueError) as e:
+            print(f"❌ No se pudo cargar el checkpoint {args.checkpoint}: {e}")
+            return None
+        if os.path.abspath(estado['video']) != os.path.abspath(ruta_video):
+            print(f"❌ El checkpoint corresponde a otro video: {estado['video']}")
+            return None
+
+        frame_nmr = estado['frame_nmr'] + 1
+        try:
+            cap = abrir_en_frame(ruta_video, frame_nmr)
+        except ValueError as e:
+            print(f"❌ No se pudo reanudar: {e}")
+            return None
+        procesador.restaurar(estado['procesador'])
+        estadisticas = estado['estadisticas']
+
+        # Descartar filas escritas después del checkpoint
+        csv_file = open(args.salida, 'r+', newline='', encoding='utf-8')
+        csv_file.truncate(estado['csv_offset'])
+        csv_file.seek(estado['csv_offset'])
+        writer = csv.writer(csv_file)
+
+        if args.almacen_recortes:
+            almacen = AlmacenRecortes(args.almacen_recortes, estado=estado.get('almacen'))
+        if args.eventos:
+            estado_eventos = estado.get('eventos')
+            eventos = crear_eventos(args, offset=estado_eventos['offset'] if estado_eventos else None)
+            if estado_eventos:
+                eventos.restaurar(estado_eventos)
+        print(f"⏩ Reanudando desde el frame {frame_nmr}")
+    else:
+        cap = cv2.VideoCapture(ruta_video)
+        csv_file = open(args.salida, 'w', newline='', encoding='utf-8')
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_HEADER)
+        if args.almacen_recortes:
+            almacen = AlmacenRecortes(args.almacen_recortes)
+        if args.eventos:
+            eventos = crear_eventos(args)
+    procesador.almacen = almacen
+
+    def checkpoint(ultimo_frame):
+        csv_file.flush()
+        os.fsync(csv_file.fileno())
+        procesador.podar_lecturas()
+        return guardar_checkpoint(args.checkpoint, {
+            'video': ruta_video,
+            'frame_nmr': ultimo_frame,
+            # Primer frame decodificado en esta corrida: permite verificar una reanudación
+            'primer_frame_corrida': frame_inicial,
+            'procesador': procesador.estado(),
+            'estadisticas': estadisticas,
+            'csv_offset': csv_file.tell(),
+            'eventos': eventos.estado() if eventos is not None else None,
+            'almacen': almacen.estado() if almacen is not None else None,
+        })
+
+    tiempo_checkpoints = 0.0
+    num_checkpoints = 0
+    frame_inicial = frame_nmr
+    inicio = time.perf_counter()
+    carga = inicio - inicio_carga
+
+    # Procesar frames
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        track_ids, frame_results = procesador.procesar_frame(frame_nmr, frame)
+        write_csv_rows(writer, frame_nmr, frame_results)
+        estadisticas['total_detections'] += len(frame_results)
+        estadisticas['ocr_success'] += contar_exitos_ocr(frame_results)
+
+        if eventos is not None:
+            eventos.actualizar(frame_nmr, track_ids, frame_results)
+            eventos.retirar(frame_nmr, procesador.mot_tracker.ids_activos())
+
+        if args.checkpoint_cada > 0 and (frame_nmr + 1) % args.checkpoint_cada == 0:
+            t = time.perf_counter()
+            tamano = checkpoint(frame_nmr)
+            tiempo_checkpoints += time.perf_counter() - t
+            num_checkpoints += 1
+            print(f"💾 Checkpoint en frame {frame_nmr} ({tamano:,} bytes)")
+
+        frame_nmr += 1
+
+    # Checkpoint final: permite continuar si el video crece
+    if frame_nmr > 0 and (args.checkpoint_cada > 0 or args.checkpoint_final):
+        t = time.perf_counter()
+        checkpoint(frame_nmr - 1)
+        tiempo_checkpoints += time.perf_counter() - t
+        num_checkpoints += 1
+
+    csv_file.close()
+    cap.release()
+    if almacen is not None:
+        almacen.cerrar()
+
+    # Los tracks que siguen activos al final del video también se emiten
+    if eventos is not None:
+        emitidos = eventos.emitidos + len(eventos.activos)
+        eventos.cerrar(frame_nmr - 1 if frame_nmr > 0 else None)
+        print(f"🚗 Eventos por vehículo: {emitidos} en {args.eventos}")
+
+    tiempo_total = time.perf_counter() - inicio
+    if num_checkpoints > 0 and tiempo_total > 0:
+        print(f"⏱️ Checkpoints: {num_checkpoints} en {tiempo_checkpoints:.2f} s "
+              f"({100 * tiempo_checkpoints / tiempo_total:.2f}% del tiempo)")
+
+    return frame_nmr, estadisticas, {'carga': carga, 'proceso': tiempo_total, 'frames': frame_nmr - frame_inicial}
+
+
+def main():
+    args = parse_args()
+    repartir_cpu(args)
+
+    # Crear carpeta "imagenes" si no existe
+    os.makedirs("imagenes", exist_ok=True)
+
+    # Cargar watchlist
+    watchlist_matcher = None
+    if args.watchlist:
+        from watchlist import WatchlistIndex, WatchlistMatcher, crear_sink
+
+        watchlist_index = WatchlistIndex.desde_archivo(args.watchlist)
+        sinks = [crear_sink(spec) for spec in (args.watchlist_sink or ['print'])]
+        watchlist_matcher = WatchlistMatcher(watchlist_index, sinks, umbral=args.watchlist_umbral)
+        print(f"🚨 Watchlist cargada: {len(watchlist_index)} placas")
+
+    # Cargar video
+    ruta_video = args.video or input("👉 Ingresa la ruta o nombre del archivo de video: ")
+
+    if args.almacen_recortes and not args.resume:
+        from almacen_recortes import vaciar_almacen
+
+        os.makedirs(args.almacen_recortes, exist_ok=True)
+        vaciar_almacen(args.almacen_recortes)
+        print(f"📦 Recortes en almacén indexado: {args.almacen_recortes}")
+
+    print("🚀 Iniciando procesamiento...")
+
+    if args.workers > 1:
+        if args.resume:
+            print("❌ --resume no está soportado junto con --workers")
+            return
+
+        from pipeline import PLANTILLA_IMAGEN
+        from sharding import procesar_fragmentado
+
+        results, lecturas_por_auto, primer_frame, tiempos = procesar_fragmentado(
+            ruta_video, args.workers, solape=args.solape,
+            opciones_procesador=opciones_procesador(args),
+            plantilla_imagen=PLANTILLA_IMAGEN
+        )
+        frames_procesados = max(results) + 1 if results else 0
+
+        # Los workers no conocen los IDs globales: la watchlist se evalúa al unir
+        if watchlist_matcher is not None:
+            for car_id, lecturas in lecturas_por_auto.items():
+                consenso, score_consenso = license_consensus(lecturas)
+                watchlist_matcher.update(primer_frame[car_id], car_id, consenso, score_consenso)
+
+        write_csv(results, args.salida)
+        if args.eventos:
+            from eventos import eventos_desde_resultados
+
+            emitidos = eventos_desde_resultados(
+                args.eventos, results,
+                ref_recorte=ref_recorte(args)
+            )
+            print(f"🚗 Eventos por vehículo: {emitidos} en {args.eventos}")
+        total_detections = sum(len(results[f]) for f in results)
+        ocr_success = sum(contar_exitos_ocr(cars) for cars in results.values())
+    elif args.procesos_ocr > 0:
+        if args.resume:
+            print("❌ --resume no está soportado junto con --procesos-ocr")
+            return
+
+        from multiproceso import procesar_multiproceso
+
+        frames_procesados, estadisticas, _, tiempos = procesar_multiproceso(
+            ruta_video, args.salida, procesos_ocr=args.procesos_ocr, num_slots=args.slots,
+            opciones_procesador=opciones_procesador(args),
+            watchlist_matcher=watchlist_matcher,
+            eventos=crear_eventos(args) if args.eventos else None
+        )
+        total_detections = estadisticas['total_detections']
+        ocr_success = estadisticas['ocr_success']
+    else:
+        resultado = procesar_con_checkpoints(args, ruta_video, watchlist_matcher)
+        if resultado is None:
+            # Código de error: incremental.py no debe tomar la corrida como válida
+            sys.exit(1)
+        frames_procesados, estadisticas, tiempos = resultado
+        total_detections = estadisticas['total_detections']
+        ocr_success = estadisticas['ocr_success']
+
+    # FPS en régimen: la carga de modelos (propia o de los procesos hijos) se reporta aparte
+    segundos = tiempos['proceso']
+    segundos_carga = CARGA_OCR + tiempos['carga']
+    fps = tiempos['frames'] / max(segundos, 1e-9)
+
+    # Estadísticas finales
+    print(f"\n📊 Procesamiento completado")
+    print(f"📈 Total de frames procesados: {frames_procesados} "
+          f"({tiempos['frames']} en esta corrida, {fps:.2f} FPS)")
+    print(f"⏱️ Carga de modelos: {segundos_carga:.1f} s (fuera del cálculo de FPS)")
+    print(f"📋 Total de detecciones: {total_detections}")
+
+    if total_detections > 0:
+        success_rate = (ocr_success / total_detections) * 100
+        print(f"🔤 Placas leídas exitosamente: {ocr_success}/{total_detections} ({success_rate:.1f}%)")
+
+    print(f"✅ Archivo CSV guardado: {args.salida}")
+
+    if args.metricas:
+        with open(args.metricas, 'w', encoding='utf-8') as f:
+            json.dump({
+                'video': ruta_video,
+                'frames': frames_procesados,
+                'frames_corrida': tiempos['frames'],
+                'segundos': segundos,
+                'fps': fps,
+                'segundos_carga': segundos_carga,
+                'detecciones': total_detections,
+                'ocr_exitos': ocr_success,
+            }, f, indent=2)
 
-if total_detections > 0:
-    success_rate = (ocr_success / total_detections) * 100
-    print(f"🔤 Placas leídas exitosamente: {ocr_success}/{total_detections} ({success_rate:.1f}%)")
+    if watchlist_matcher is not None:
+        watchlist_matcher.close()
+    print("🎉 Procesamiento completado exitosamente")
 
-# Guardar resultados
-write_csv(results, './test.csv')
-print(f"✅ Archivo CSV guardado: ./test.csv")
 
-cap.release()
-print("🎉 Procesamiento completado exitosamente")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Pipeline en varios procesos sobre un ring buffer de frames en memoria compartida
+
+- El proceso principal decodifica cada frame directamente en un slot libre.
+- Un proceso detector lee el slot, detecta y rastrea vehículos y placas, y
+  encola una tarea de OCR por placa (solo índice de slot y coordenadas).
+- N procesos de OCR recortan la placa desde el mismo slot y la leen.
+- El proceso principal reordena los resultados por frame, actualiza el
+  consenso, la watchlist y los eventos por vehículo y escribe el CSV de
+  forma incremental.
+
+El slot se recicla cuando el detector y todas las tareas de OCR del frame lo
+liberaron, así ningún frame 4K se copia ni se serializa entre procesos.
+"""
+import csv
+import multiprocessing
+import queue
+import time
+
+import cv2
+import numpy as np
+
+from recursos import configurar_hilos
+from ring_buffer import FrameRingBuffer
+from util import CSV_HEADER, write_csv_rows
+
+
+def proceso_detector(buffer, cola_frames, cola_ocr, cola_resultados, opciones_procesador, procesos_ocr, hilos=None):
+    """Detectar y rastrear vehículos y placas; delegar el OCR por índice de slot"""
+    inicio = time.perf_counter()
+    from pipeline import ProcesadorPlacas
+
+    if hilos:
+        configurar_hilos(hilos)
+
+    procesador = ProcesadorPlacas(verbose=False, **opciones_procesador)
+    cola_resultados.put(('listo', time.perf_counter() - inicio))
+
+    while True:
+        mensaje = cola_frames.get()
+        if mensaje is None:
+            break
+
+        slot, frame_nmr = mensaje
+        frame = buffer.vista(slot)
+        track_ids = procesador.rastrear(frame_nmr, frame)
+        num_placas, asignadas = procesador.detectar_placas(frame, track_ids)
+
+        for license_plate, vehiculo in asignadas:
+            # Cada tarea de OCR retiene el slot hasta terminar
+            buffer.agregar_referencias(slot)
+            cola_ocr.put((slot, frame_nmr, [float(v) for v in license_plate], [float(v) for v in vehiculo]))
+
+        # Los tracks y los IDs vivos viajan con el frame para emitir los eventos en orden
+        tracks = [[float(v) for v in track] for track in track_ids]
+        cola_resultados.put(('frame', frame_nmr, len(asignadas), num_placas,
+                             tracks, procesador.mot_tracker.ids_activos()))
+        buffer.liberar(slot)
+
+    for _ in range(procesos_ocr):
+        cola_ocr.put(None)
+    buffer.cerrar()
+
+
+def proceso_ocr(buffer, cola_ocr, cola_resultados, plantilla_imagen, carpeta_recortes=None, escritor='ocr',
+                hilos=None):
+    """Leer placas recortando directamente del slot compartido"""
+    # Importar pipeline carga YOLO y util crea el lector de EasyOCR
+    inicio = time.perf_counter()
+    from almacen_recortes import AlmacenRecortes
+    from pipeline import leer_placa
+
+    if hilos:
+        configurar_hilos(hilos)
+
+    # Cada proceso de OCR escribe en su propio índice y segmentos del almacén
+    almacen = AlmacenRecortes(carpeta_recortes, escritor=escritor) if carpeta_recortes else None
+    cola_resultados.put(('listo', time.perf_counter() - inicio))
+
+    while True:
+        tarea = cola_ocr.get()
+        if tarea is None:
+            break
+
+        slot, frame_nmr, license_plate, vehiculo = tarea
+        x1, y1, x2, y2 = license_plate[:4]
+        try:
+            license_plate_crop = buffer.vista(slot)[int(y1):int(y2), int(x1):int(x2), :]
+            datos = leer_placa(frame_nmr, license_plate_crop, license_plate, vehiculo,
+                               plantilla_imagen, log=lambda mensaje: None, almacen=almacen)
+        finally:
+            buffer.liberar(slot)
+
+        cola_resultados.put(('ocr', frame_nmr, int(vehiculo[4]), datos))
+
+    if almacen is not None:
+        almacen.cerrar()
+    buffer.cerrar()
+
+
+def procesar_multiproceso(ruta_video, ruta_csv, procesos_ocr=2, num_slots=8, opciones_procesador=None,
+                          watchlist_matcher=None, eventos=None):
+    """Procesar un video con detector y OCR en procesos separados
+
+    Con `eventos` (EventosVehiculo) se emite un evento por track al retirarse.
+    Devuelve (frames_procesados, estadisticas, lecturas_por_auto, tiempos); en
+    `tiempos`, 'carga' es la espera hasta que todos los procesos cargaron sus
+    modelos, 'proceso' el tiempo desde ahí hasta el último frame y 'frames'
+    los frames procesados.
+    """
+    from pipeline import PLANTILLA_IMAGEN, registrar_lectura
+
+    opciones_procesador = dict(opciones_procesador or {})
+    plantilla_imagen = opciones_procesador.pop('plantilla_imagen', PLANTILLA_IMAGEN)
+    carpeta_recortes = opciones_procesador.pop('carpeta_recortes', None)
+    hilos = opciones_procesador.pop('hilos', None)
+
+    cap = cv2.VideoCapture(ruta_video)
+    ret, primer_frame = cap.read()
+    if not ret:
+        cap.release()
+        if eventos is not None:
+            eventos.cerrar()
+        return 0, {'total_detections': 0, 'ocr_success': 0}, {}, {'carga': 0.0, 'proceso': 0.0, 'frames': 0}
+
+    contexto = multiprocessing.get_context('spawn')
+    buffer = FrameRingBuffer.crear(num_slots, primer_frame.shape, primer_frame.dtype, contexto=contexto)
+    cola_frames = contexto.Queue()
+    cola_ocr = contexto.Queue()
+    cola_resultados = contexto.Queue()
+
+    procesos = [contexto.Process(
+        target=proceso_detector,
+        args=(buffer, cola_frames, cola_ocr, cola_resultados, opciones_procesador, procesos_ocr, hilos)
+    )]
+    procesos += [contexto.Process(target=proceso_ocr, args=(buffer, cola_ocr, cola_resultados, plantilla_imagen,
+                                                            carpeta_recortes, f"ocr{i}", hilos))
+                 for i in range(procesos_ocr)]
+    print(f"🧠 Ring buffer: {num_slots} slots de {buffer.bytes_por_slot / 1e6:.1f} MB, "
+          f"1 detector + {procesos_ocr} procesos OCR")
+
+    csv_file = open(ruta_csv, 'w', newline='', encoding='utf-8')
+    writer = csv.writer(csv_file)
+    writer.writerow(CSV_HEADER)
+
+    estadisticas = {'total_detections': 0, 'ocr_success': 0}
+    lecturas_por_auto = {}
+    pendientes = {}
+    siguiente = [0]
+
+    def pendiente(frame_nmr):
+        return pendientes.setdefault(frame_nmr, {'esperadas': None, 'recibidas': 0, 'datos': {},
+                                                 'tracks': [], 'ids_activos': set()})
+
+    def drenar(timeout=0.0):
+        """Recibir resultados y emitir en orden los frames completos"""
+        try:
+            while True:
+                mensaje = cola_resultados.get(timeout=timeout) if timeout else cola_resultados.get_nowait()
+                timeout = 0.0
+                if mensaje[0] == 'frame':
+                    _, frame_nmr, esperadas, _, tracks, ids_activos = mensaje
+                    estado = pendiente(frame_nmr)
+                    estado['esperadas'] = esperadas
+                    estado['tracks'] = tracks
+                    estado['ids_activos'] = ids_activos
+                else:
+                    _, frame_nmr, car_id, datos = mensaje
+                    estado = pendiente(frame_nmr)
+                    estado['recibidas'] += 1
+                    estado['datos'][car_id] = datos
+        except queue.Empty:
+            pass
+
+        while siguiente[0] in pendientes:
+            estado = pendientes[siguiente[0]]
+            if estado['esperadas'] is None or estado['recibidas'] < estado['esperadas']:
+                break
+            frame_results = estado['datos']
+            write_csv_rows(writer, siguiente[0], frame_results)
+            estadisticas['total_detections'] += len(frame_results)
+            for car_id, datos in frame_results.items():
+                if datos['license_plate']['text'] not in ['UNKNOWN', 'NO_OCR', '']:
+                    estadisticas['ocr_success'] += 1
+                registrar_lectura(lecturas_por_auto, watchlist_matcher, siguiente[0], car_id, datos)
+            if eventos is not None:
+                eventos.actualizar(siguiente[0], estado['tracks'], frame_results)
+                eventos.retirar(siguiente[0], estado['ids_activos'])
+            del pendientes[siguiente[0]]
+            siguiente[0] += 1
+
+    def verificar_procesos():
+        caidos = [p for p in procesos if p.exitcode not in (None, 0)]
+        if caidos:
+            raise RuntimeError(f"Un proceso del pipeline terminó con error (código {caidos[0].exitcode})")
+
+    completado = False
+    try:
+        inicio_carga = time.perf_counter()
+        for proceso in procesos:
+            proceso.start()
+
+        # Decodificar recién con todos los modelos cargados: la carga no cuenta como procesamiento
+        listos = 0
+        while listos < len(procesos):
+            try:
+                cola_resultados.get(timeout=0.5)
+                listos += 1
+            except queue.Empty:
+                verificar_procesos()
+        inicio = time.perf_counter()
+        tiempos = {'carga': inicio - inicio_carga}
+        frame_nmr = 0
+        frame = primer_frame
+
+        while True:
+            # Esperar un slot libre sin dejar de recibir resultados
+            while True:
+                try:
+                    slot = buffer.adquirir(timeout=0.05)
+                    break
+                except queue.Empty:
+                    drenar()
+                    verificar_procesos()
+
+            vista = buffer.vista(slot)
+            if frame is not None:
+                np.copyto(vista, frame)
+                frame = None
+            else:
+                # Decodificar directamente sobre la memoria compartida
+                ret, leido = cap.read(vista)
+                if not ret:
+                    buffer.publicar(slot, 0)
+                    break
+                if not np.shares_memory(leido, vista):
+                    np.copyto(vista, leido)
+
+            buffer.publicar(slot, 1)
+            cola_frames.put((slot, frame_nmr))
+            frame_nmr += 1
+            drenar()
+
+            if frame_nmr % 100 == 0:
+                fps = frame_nmr / (time.perf_counter() - inicio)
+                print(f"📹 Frame {frame_nmr} decodificado ({fps:.1f} FPS, {siguiente[0]} frames completos)")
+
+        cola_frames.put(None)
+        while siguiente[0] < frame_nmr:
+            drenar(timeout=0.5)
+            verificar_procesos()
+        tiempos['proceso'] = time.perf_counter() - inicio
+        tiempos['frames'] = frame_nmr
+
+        for proceso in procesos:
+            proceso.join()
+        completado = True
+    finally:
+        if not completado:
+            # Un proceso falló (o se interrumpió): los demás pueden quedar bloqueados en sus colas
+            for proceso in procesos:
+                if proceso.is_alive():
+                    proceso.terminate()
+            for proceso in procesos:
+                if proceso.pid is not None:
+                    proceso.join()
+            # Mensajes sin consumir no deben bloquear la salida del intérprete
+            for cola in (cola_frames, cola_ocr, cola_resultados):
+                cola.cancel_join_thread()
+
+        cap.release()
+        csv_file.close()
+        buffer.cerrar()
+
+    if eventos is not None:
+        eventos.cerrar(frame_nmr - 1)
+
+    return frame_nmr, estadisticas, lecturas_por_auto, tiempos
@@ -0,0 +1,275 @@
+"""
+Procesamiento por frame: detección de vehículos, seguimiento, detección de placas y OCR
+
+Lo usan main.py (un solo proceso) y sharding.py (un procesador por worker).
+"""
+from ultralytics import YOLO
+import cv2
+import numpy as np
+
+from tracker import crear_tracker, iou_batch
+from util import get_car, read_license_plate, license_consensus
+
+# Clases de vehículos en COCO: car, motorcycle, bus, truck
+vehicles = [2, 3, 5, 7]
+
+PLANTILLA_IMAGEN = "imagenes/placa_frame{frame}_car{car}.jpg"
+
+# Con vehículos solapados la misma placa aparece en varios recortes
+IOU_PLACA_DUPLICADA = 0.5
+
+
+class PoliticaResolucion:
+    """Resolución de entrada de cada etapa
+
+    - lado_vehiculos: lado mayor con el que se detectan vehículos (None = frame
+      completo con el tamaño por defecto de YOLO). El frame se reduce con
+      INTER_AREA y las cajas se reescalan a coordenadas del frame original.
+    - placas_en_roi: detectar placas en recortes a resolución completa de cada
+      vehículo rastreado en vez de en el frame completo reducido por YOLO.
+    - lado_placas: imgsz del detector de placas.
+    """
+
+    def __init__(self, lado_vehiculos=None, placas_en_roi=False, lado_placas=640):
+        self.lado_vehiculos = lado_vehiculos
+        self.placas_en_roi = placas_en_roi
+        self.lado_placas = lado_placas
+
+    def __repr__(self):
+        return (f"PoliticaResolucion(lado_vehiculos={self.lado_vehiculos}, "
+                f"placas_en_roi={self.placas_en_roi}, lado_placas={self.lado_placas})")
+
+
+def reducir_frame(frame, lado):
+    """Reducir el frame para que su lado mayor sea `lado`; devuelve (frame, escala)"""
+    h, w = frame.shape[:2]
+    if lado is None or max(h, w) <= lado:
+        return frame, 1.0
+    escala = lado / max(h, w)
+    return cv2.resize(frame, (int(round(w * escala)), int(round(h * escala))), interpolation=cv2.INTER_AREA), escala
+
+
+def imgsz_para(lado):
+    """imgsz de YOLO: múltiplo de 32 más cercano a `lado`"""
+    return max(32, int(round(lado / 32)) * 32)
+
+
+def suprimir_duplicadas(placas, umbral=IOU_PLACA_DUPLICADA):
+    """NMS: de cada grupo de placas con IoU >= umbral queda la de mayor confianza"""
+    placas = sorted(placas, key=lambda p: p[4], reverse=True)
+    iou = iou_batch([p[:4] for p in placas], [p[:4] for p in placas])
+    conservadas = []
+    for i in range(len(placas)):
+        if all(iou[i, j] < umbral for j in conservadas):
+            conservadas.append(i)
+    return [placas[i] for i in conservadas]
+
+
+def leer_placa(frame_nmr, license_plate_crop, license_plate, vehiculo, plantilla_imagen, log=print, almacen=None):
+    """Guardar el recorte de la placa, leerlo con OCR y armar el registro del vehículo
+
+    Con `almacen` (AlmacenRecortes) el recorte se agrega al almacén en lugar de
+    escribirse como JPEG individual.
+    """
+    x1, y1, x2, y2, score, class_id = license_plate
+    xcar1, ycar1, xcar2, ycar2, car_id = vehiculo
+
+    # Guardar imagen de placa
+    try:
+        if almacen is not None:
+            almacen.agregar(frame_nmr, int(car_id), license_plate_crop)
+        else:
+            nombre_imagen = plantilla_imagen.format(frame=frame_nmr, car=int(car_id))
+            cv2.imwrite(nombre_imagen, license_plate_crop)
+            log(f"💾 Placa guardada: {nombre_imagen}")
+    except Exception as e:
+        print(f"⚠️ Error al guardar imagen: {e}")
+
+    # Leer texto de placa con OCR
+    license_text, text_score = read_license_plate(license_plate_crop)
+
+    if license_text is not None:
+        log(f"✅ Placa leída: {license_text} (Confianza: {text_score:.2f})")
+        return {
+            'car': {'bbox': [xcar1, ycar1, xcar2, ycar2]},
+            'license_plate': {
+                'bbox': [x1, y1, x2, y2],
+                'text': license_text,
+                'bbox_score': score,
+                'text_score': text_score
+            }
+        }
+
+    log(f"⚠️ No se pudo leer placa en Frame {frame_nmr}, Car ID {int(car_id)}")
+    return {
+        'car': {'bbox': [xcar1, ycar1, xcar2, ycar2]},
+        'license_plate': {
+            'bbox': [x1, y1, x2, y2],
+            'text': 'UNKNOWN',
+            'bbox_score': score,
+            'text_score': 0.0
+        }
+    }
+
+
+def registrar_lectura(lecturas_por_auto, watchlist_matcher, frame_nmr, car_id, datos):
+    """Actualizar el consenso del vehículo y compararlo con la watchlist"""
+    license_text = datos['license_plate']['text']
+    if license_text == 'UNKNOWN':
+        return
+
+    lecturas = lecturas_por_auto.setdefault(car_id, [])
+    lecturas.append((license_text, datos['license_plate']['text_score']))
+    if watchlist_matcher is not None:
+        consenso, score_consenso = license_consensus(lecturas)
+        watchlist_matcher.update(frame_nmr, car_id, consenso, score_consenso)
+
+
+class ProcesadorPlacas:
+    """Modelos, tracker y estado OCR por vehículo de un video"""
+
+    def __init__(self, tracker='sort', watchlist_matcher=None, plantilla_imagen=PLANTILLA_IMAGEN, verbose=True,
+                 politica=None, almacen=None):
+        # Cargar modelos
+        self.coco_model = YOLO('yolo11n.pt')
+        self.license_plate_detector = YOLO('license_plate_detector.pt')
+
+        self.mot_tracker = crear_tracker(tracker)
+        self.politica = politica or PoliticaResolucion()
+        self.watchlist_matcher = watchlist_matcher
+        self.plantilla_imagen = plantilla_imagen
+        self.almacen = almacen
+        self.verbose = verbose
+
+        # Lecturas OCR acumuladas por vehículo para el consenso de placa
+        self.lecturas_por_auto = {}
+
+    def estado(self):
+        """Estado necesario para reanudar el procesamiento (ver checkpoint.py)"""
+        return {
+            'tracker': self.mot_tracker,
+            'lecturas_por_auto': self.lecturas_por_auto,
+            'watchlist_alertados': self.watchlist_matcher.alertados if self.watchlist_matcher else set(),
+        }
+
+    def restaurar(self, estado):
+        self.mot_tracker = estado['tracker']
+        self.lecturas_por_auto = estado['lecturas_por_auto']
+        if self.watchlist_matcher is not None:
+            self.watchlist_matcher.alertados = estado['watchlist_alertados']
+
+    def podar_lecturas(self):
+        """Descartar lecturas de vehículos que el tracker ya retiró (nunca vuelven)"""
+        activos = self.mot_tracker.ids_activos()
+        for car_id in list(self.lecturas_por_auto):
+            if car_id not in activos:
+                del self.lecturas_por_auto[car_id]
+
+    def _log(self, mensaje):
+        if self.verbose:
+            print(mensaje)
+
+    def rastrear(self, frame_nmr, frame):
+        """Detectar vehículos y actualizar el tracker; devuelve [[x1, y1, x2, y2, car_id], ...]"""
+        opciones = {'verbose': self.verbose}
+        if self.mot_tracker.conf_deteccion is not None:
+            # El tracker aprovecha detecciones de baja confianza
+            opciones['conf'] = self.mot_tracker.conf_deteccion
+
+        # Los vehículos son grandes: se detectan sobre el frame reducido
+        frame_reducido, escala = reducir_frame(frame, self.politica.lado_vehiculos)
+        if self.politica.lado_vehiculos is not None:
+            opciones['imgsz'] = imgsz_para(max(frame_reducido.shape[:2]))
+
+        detections = self.coco_model(frame_reducido, **opciones)[0]
+        detections_ = []
+
+        if detections.boxes is not None:
+            for detection in detections.boxes.data.tolist():
+                x1, y1, x2, y2, score, class_id = detection
+                if int(class_id) in vehicles:
+                    detections_.append([x1 / escala, y1 / escala, x2 / escala, y2 / escala, score])
+
+        self._log(f"🟩 Frame {frame_nmr}: Vehículos detectados = {len(detections_)}")
+
+        # Rastrear vehículos
+        if len(detections_) == 0:
+            detections_ = np.empty((0, 5))
+        return self.mot_tracker.update(np.asarray(detections_))
+
+    def detectar_placas(self, frame, track_ids):
+        """Detectar placas y asignarlas a vehículos; devuelve (num_placas, [(placa, vehiculo)])"""
+        asignadas = []
+
+        if not self.politica.placas_en_roi:
+            license_plates = self.license_plate_detector(
+                frame, imgsz=imgsz_para(self.politica.lado_placas), verbose=self.verbose)[0]
+            if license_plates.boxes is None:
+                return 0, asignadas
+
+            placas = license_plates.boxes.data.tolist()
+            for license_plate in placas:
+                # Asignar placa a vehículo
+                vehiculo = get_car(license_plate, track_ids)
+                if vehiculo[4] != -1:
+                    asignadas.append((license_plate, vehiculo))
+            return len(placas), asignadas
+
+        # Placas en recortes a resolución completa de cada vehículo
+        h, w = frame.shape[:2]
+        origenes = []
+        recortes = []
+        for xcar1, ycar1, xcar2, ycar2, car_id in track_ids:
+            cx1, cy1 = max(0, int(xcar1)), max(0, int(ycar1))
+            cx2, cy2 = min(w, int(xcar2)), min(h, int(ycar2))
+            if cx2 - cx1 > 1 and cy2 - cy1 > 1:
+                origenes.append((cx1, cy1))
+                recortes.append(frame[cy1:cy2, cx1:cx2])
+
+        if not recortes:
+            return 0, asignadas
+
+        placas = []
+        resultados = self.license_plate_detector(recortes, imgsz=imgsz_para(self.politica.lado_placas),
+                                                 verbose=self.verbose)
+        for (cx1, cy1), license_plates in zip(origenes, resultados):
+            if license_plates.boxes is None:
+                continue
+            # Coordenadas del frame: las de recortes solapados se vuelven comparables
+            for x1, y1, x2, y2, score, class_id in license_plates.boxes.data.tolist():
+                placas.append([x1 + cx1, y1 + cy1, x2 + cx1, y2 + cy1, score, class_id])
+        placas = suprimir_duplicadas(placas)
+
+        # Misma regla de contención que en el frame completo y una placa por vehículo (la de mayor confianza)
+        por_vehiculo = {}
+        for license_plate in placas:
+            vehiculo = get_car(license_plate, track_ids)
+            if vehiculo[4] != -1 and vehiculo[4] not in por_vehiculo:
+                por_vehiculo[vehiculo[4]] = (license_plate, vehiculo)
+
+        return len(placas), list(por_vehiculo.values())
+
+    def registrar_lectura(self, frame_nmr, car_id, datos):
+        registrar_lectura(self.lecturas_por_auto, self.watchlist_matcher, frame_nmr, car_id, datos)
+
+    def procesar_frame(self, frame_nmr, frame):
+        """Procesar un frame completo; devuelve (track_ids, resultados {car_id: datos})"""
+        frame_results = {}
+        track_ids = self.rastrear(frame_nmr, frame)
+
+        # Detectar placas
+        num_placas, asignadas = self.detectar_placas(frame, track_ids)
+
+        for license_plate, vehiculo in asignadas:
+            x1, y1, x2, y2 = license_plate[:4]
+            car_id = int(vehiculo[4])
+
+            # Recortar placa
+            license_plate_crop = frame[int(y1):int(y2), int(x1):int(x2), :]
+            frame_results[car_id] = leer_placa(frame_nmr, license_plate_crop, license_plate, vehiculo,
+                                               self.plantilla_imagen, self._log, self.almacen)
+            self.registrar_lectura(frame_nmr, car_id, frame_results[car_id])
+
+        self._log(f"🟦 Frame {frame_nmr}: Placas detectadas = {num_placas}")
+
+        return track_ids, frame_results
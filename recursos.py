@@ -0,0 +1,142 @@
+"""
+Presupuesto de hilos de CPU para PyTorch, OpenCV y BLAS de NumPy
+
+Sin configuración, ultralytics/PyTorch, OpenCV y EasyOCR crean cada uno un
+pool de hilos del tamaño de todos los núcleos, en cada proceso. Con varios
+workers (o varias instancias de main.py) eso multiplica los hilos muy por
+encima de los núcleos y el sistema pasa el tiempo cambiando de contexto.
+
+Este módulo reparte un presupuesto global de núcleos entre los procesos
+concurrentes y fija los hilos de cada biblioteca. No importa numpy ni cv2:
+las variables de entorno de BLAS/OpenMP solo se leen al cargar esas
+bibliotecas, así que `preparar_entorno()` debe llamarse antes de importarlas
+(los procesos hijos con spawn heredan el entorno ya ajustado).
+
+Las instancias de main.py se anuncian con un archivo bloqueado en una carpeta
+compartida, así una instancia nueva sabe cuántas hay en ejecución.
+"""
+import os
+import tempfile
+
+# Variables que leen las bibliotecas de álgebra lineal y OpenMP al cargarse
+VARIABLES_OMP = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS']
+VARIABLES_BLAS = ['OPENBLAS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+CARPETA_INSTANCIAS = os.path.join(tempfile.gettempdir(), 'placas_instancias')
+
+# Archivo de esta instancia: el bloqueo dura mientras siga abierto
+_instancia = None
+
+
+def nucleos_disponibles():
+    """Núcleos que este proceso puede usar (respeta taskset/cgroups de afinidad)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def hilos_por_proceso(nucleos, procesos):
+    """Hilos para cada uno de `procesos` procesos concurrentes (mínimo 1)"""
+    return max(1, nucleos // max(1, procesos))
+
+
+def registrar_instancia(carpeta=CARPETA_INSTANCIAS):
+    """Anunciar esta instancia y devolver cuántas hay en ejecución (incluida esta)
+
+    Cada instancia mantiene un flock sobre `<pid>.lock` hasta terminar; el
+    sistema lo libera aunque el proceso muera, así un archivo que se puede
+    bloquear es de una instancia terminada y se borra. Sin fcntl (Windows) o
+    sin permisos sobre la carpeta se asume una sola instancia.
+    """
+    global _instancia
+    try:
+        import fcntl
+    except ImportError:
+        return 1
+
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        propio = os.path.join(carpeta, f"{os.getpid()}.lock")
+        if _instancia is None:
+            _instancia = open(propio, 'w')
+            fcntl.flock(_instancia, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        activas = 1
+        for nombre in os.listdir(carpeta):
+            ruta = os.path.join(carpeta, nombre)
+            if ruta == propio or not nombre.endswith('.lock'):
+                continue
+            try:
+                with open(ruta) as f:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.remove(ruta)
+            except BlockingIOError:
+                activas += 1
+            except FileNotFoundError:
+                pass
+        return activas
+    except OSError:
+        return 1
+
+
+def preparar_entorno(hilos=None):
+    """Fijar las variables de entorno de hilos antes de importar numpy, cv2 o torch
+
+    No pisa valores definidos por el usuario. NumPy solo opera sobre matrices
+    pequeñas (Kalman, IoU), donde un BLAS multihilo es puro overhead: se deja en 1.
+    """
+    hilos = hilos or nucleos_disponibles()
+    for variable in VARIABLES_OMP:
+        os.environ.setdefault(variable, str(hilos))
+    for variable in VARIABLES_BLAS:
+        os.environ.setdefault(variable, '1')
+
+
+def configurar_hilos(hilos):
+    """Aplicar `hilos` a este proceso y a los procesos hijos que cree
+
+    Las variables de entorno se fuerzan para que los hijos (spawn) arranquen
+    con el valor correcto; en este proceso los pools de torch y OpenCV se
+    ajustan en caliente. Devuelve el reparto aplicado.
+    """
+    for variable in VARIABLES_OMP:
+        os.environ[variable] = str(hilos)
+    for variable in VARIABLES_BLAS:
+        os.environ[variable] = '1'
+
+    reparto = {'torch': None, 'opencv': None, 'blas': int(os.environ['OPENBLAS_NUM_THREADS'])}
+
+    try:
+        import torch
+
+        torch.set_num_threads(hilos)
+        try:
+            # Solo se puede fijar antes del primer trabajo en paralelo
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+        reparto['torch'] = torch.get_num_threads()
+    except ImportError:
+        pass
+
+    try:
+        import cv2
+
+        cv2.setNumThreads(hilos)
+        reparto['opencv'] = cv2.getNumThreads()
+    except ImportError:
+        pass
+
+    return reparto
+
+
+def describir_reparto(nucleos, procesos, hilos, reparto, rol='proceso'):
+    texto = (f"🧮 Presupuesto de CPU: {nucleos} núcleos → {procesos} {rol}{'s' if procesos != 1 else ''} "
+             f"x {hilos} hilo{'s' if hilos != 1 else ''}")
+    detalles = [f"{biblioteca} {valor}" for biblioteca, valor in reparto.items() if valor is not None]
+    if detalles:
+        texto += f" ({', '.join(detalles)})"
+    if procesos * hilos > nucleos:
+        texto += " ⚠️ más procesos que núcleos"
+    return texto
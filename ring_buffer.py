@@ -0,0 +1,102 @@
+"""
+Ring buffer de frames en memoria compartida para workers en varios procesos
+
+Los frames decodificados viven en un único bloque de `multiprocessing.shared_memory`
+visto como array NumPy (num_slots, alto, ancho, canales). Entre procesos solo
+viajan índices de slot, nunca los píxeles. Cada slot lleva un contador de
+referencias: el productor lo publica con tantas referencias como consumidores
+lo vayan a leer, y el slot vuelve a la lista de libres cuando el último
+consumidor lo libera.
+"""
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class FrameRingBuffer:
+    """Slots de frames en memoria compartida con conteo de referencias
+
+    Se crea en el proceso principal con `crear` y se pasa tal cual como
+    argumento a los procesos hijos, que se conectan al mismo bloque.
+    """
+
+    def __init__(self, nombre, num_slots, shape, dtype, lock, libres, shm=None):
+        self.nombre = nombre
+        self.num_slots = num_slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.lock = lock
+        self.libres = libres
+        self.propietario = shm is not None
+
+        # Los procesos hijos comparten el resource tracker del creador: solo el propietario hace unlink
+        self.shm = shm if shm is not None else shared_memory.SharedMemory(name=nombre)
+        tamano_frames = num_slots * int(np.prod(self.shape)) * self.dtype.itemsize
+        self.frames = np.ndarray((num_slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self.referencias = np.ndarray((num_slots,), dtype=np.int32, buffer=self.shm.buf, offset=tamano_frames)
+
+    @classmethod
+    def crear(cls, num_slots, shape, dtype=np.uint8, contexto=None):
+        contexto = contexto or multiprocessing.get_context()
+        dtype = np.dtype(dtype)
+        tamano = num_slots * int(np.prod(shape)) * dtype.itemsize + num_slots * 4
+        shm = shared_memory.SharedMemory(create=True, size=tamano)
+
+        libres = contexto.Queue()
+        for slot in range(num_slots):
+            libres.put(slot)
+
+        buffer = cls(shm.name, num_slots, shape, dtype, contexto.Lock(), libres, shm=shm)
+        buffer.referencias[:] = 0
+        return buffer
+
+    def __getstate__(self):
+        return {
+            'nombre': self.nombre, 'num_slots': self.num_slots, 'shape': self.shape,
+            'dtype': self.dtype.str, 'lock': self.lock, 'libres': self.libres,
+        }
+
+    def __setstate__(self, estado):
+        self.__init__(estado['nombre'], estado['num_slots'], estado['shape'], estado['dtype'],
+                      estado['lock'], estado['libres'])
+
+    @property
+    def bytes_por_slot(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def adquirir(self, timeout=None):
+        """Esperar un slot libre para escribir; devuelve su índice (queue.Empty si vence el timeout)"""
+        return self.libres.get(timeout=timeout)
+
+    def vista(self, slot):
+        """Array NumPy sobre el slot, sin copia"""
+        return self.frames[slot]
+
+    def publicar(self, slot, referencias):
+        """Marcar el slot como escrito con `referencias` lectores pendientes"""
+        with self.lock:
+            self.referencias[slot] = referencias
+        if referencias <= 0:
+            self.libres.put(slot)
+
+    def agregar_referencias(self, slot, cantidad=1):
+        """Sumar lectores a un slot publicado (ej. tareas de OCR derivadas de un frame)"""
+        with self.lock:
+            self.referencias[slot] += cantidad
+
+    def liberar(self, slot):
+        """Soltar una referencia; el slot se recicla cuando llega a cero"""
+        with self.lock:
+            self.referencias[slot] -= 1
+            libre = self.referencias[slot] <= 0
+        if libre:
+            self.libres.put(slot)
+
+    def cerrar(self):
+        """Desconectar este proceso; el propietario además libera la memoria"""
+        self.frames = None
+        self.referencias = None
+        self.shm.close()
+        if self.propietario:
+            self.shm.unlink()
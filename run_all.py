@@ -2,18 +2,22 @@
 """
 Script principal para ejecutar todo el pipeline de detección de placas con OCR
 """
+import argparse
 import os
 import subprocess
 import sys
 import time
 
+# Ver almacen_recortes.CARPETA_ALMACEN (no se importa aquí para no requerir cv2 al verificar requisitos)
+CARPETA_ALMACEN = 'imagenes/almacen'
+
 def print_header(title):
     """Imprimir encabezado estilizado"""
     print("\n" + "="*60)
     print(f"🎯 {title}")
     print("="*60)
 
-def run_script(script_name, description):
+def run_script(script_name, description, args=()):
     """Ejecutar un script y manejar errores"""
     print_header(description)
     
@@ -23,7 +27,7 @@ def run_script(script_name, description):
     
     try:
         start_time = time.time()
-        result = subprocess.run([sys.executable, script_name], 
+        result = subprocess.run([sys.executable, script_name, *args], 
                               capture_output=False, 
                               text=True, 
                               cwd=os.getcwd())
@@ -51,7 +55,7 @@ def check_requirements():
     
     # Verificar archivos necesarios
     required_files = [
-        'main.py', 'util.py', 'add_missing_data.py', 'visualize.py',
+        'main.py', 'util.py', 'add_missing_data.py', 'visualize.py', 'incremental.py',
         'license_plate_detector.pt'
     ]
     
@@ -110,8 +114,44 @@ def show_results():
         else:
             print(f"   ❌ {description}: {file_path} (no generado)")
 
+    # Almacén indexado: se cuenta desde los índices, sin listar archivos
+    if os.path.isdir(CARPETA_ALMACEN):
+        try:
+            from almacen_recortes import LectorRecortes
+
+            almacen = LectorRecortes(CARPETA_ALMACEN)
+            print(f"   ✅ Almacén de recortes: {len(almacen)} recortes ({almacen.tamano_bytes():,} bytes)")
+        except Exception as e:
+            print(f"   ⚠️ No se pudo leer el almacén de recortes: {e}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pipeline completo de detección de placas")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Procesar solo videos nuevos o frames agregados (ver incremental.py)")
+    parser.add_argument('--videos', nargs='+', help="Videos o carpetas para el modo incremental")
+    parser.add_argument('--flags-main', default='', help="Flags adicionales para main.py en el modo incremental "
+                             "(con '=': --flags-main=\"--placas-roi\")")
+    return parser.parse_args()
+
+def run_incremental(args):
+    """Modo incremental: detección, interpolación y eventos solo sobre el material nuevo"""
+    if not args.videos:
+        print("❌ El modo incremental requiere --videos")
+        return
+
+    start_time = time.time()
+    if not run_script('incremental.py', 'PROCESAMIENTO INCREMENTAL',
+                      # Con '=' el valor puede empezar con '--' sin confundirse con otra opción
+                      ['--videos', *args.videos, f'--flags-main={args.flags_main}']):
+        return
+
+    print_header("PIPELINE INCREMENTAL COMPLETADO")
+    print(f"⏱️ Tiempo total: {time.time() - start_time:.1f} segundos")
+    print("📁 Salidas por video en incremental/ (manifiesto.json)")
+
 def main():
     """Función principal del pipeline"""
+    args = parse_args()
     print("🚀 PIPELINE DE DETECCIÓN DE PLACAS CON OCR")
     print("🔤 Versión mejorada con lectura de texto")
     
@@ -119,6 +159,10 @@ def main():
     if not check_requirements():
         print("\n❌ No se pueden ejecutar los scripts. Revisa los requisitos.")
         return
+
+    if args.incremental:
+        run_incremental(args)
+        return
     
     total_start_time = time.time()
     
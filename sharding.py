@@ -0,0 +1,248 @@
+"""
+Procesamiento paralelo de un video largo por segmentos de tiempo
+
+Cada worker procesa un segmento [inicio, fin) precedido de `solape` frames de
+calentamiento en los que solo se detectan y rastrean vehículos, para que el
+tracker llegue al primer frame propio con los tracks ya confirmados. Después
+se cosen los tracks entre segmentos vecinos comparando sus cajas en la zona
+de solape (y el consenso de placa cuando existe) y se renumeran los car_id de
+forma global, de modo que el CSV combinado es equivalente al de un solo
+proceso salvo por el valor concreto de los IDs.
+"""
+import multiprocessing
+import os
+import time
+
+import cv2
+import numpy as np
+
+from almacen_recortes import AlmacenRecortes, remapear_ids
+from recursos import configurar_hilos
+from tracker import asociar, iou_batch
+from util import license_consensus
+
+PLANTILLA_IMAGEN_SEGMENTO = "imagenes/.seg{segmento}_placa_frame{{frame}}_car{{car}}.jpg"
+
+
+def contar_frames(ruta_video):
+    cap = cv2.VideoCapture(ruta_video)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return total
+
+
+def planificar_segmentos(total_frames, num_segmentos):
+    """Dividir [0, total_frames) en segmentos contiguos; el último queda abierto (fin=None)"""
+    num_segmentos = max(1, min(num_segmentos, total_frames))
+    limites = np.linspace(0, total_frames, num_segmentos + 1).astype(int)
+    segmentos = [(int(limites[i]), int(limites[i + 1])) for i in range(num_segmentos)]
+    # El conteo de frames del contenedor puede ser aproximado: el último segmento lee hasta el final
+    segmentos[-1] = (segmentos[-1][0], None)
+    return segmentos
+
+
+def _cajas(track_ids):
+    return {int(t[4]): [float(v) for v in t[:4]] for t in track_ids}
+
+
+def procesar_segmento(tarea):
+    """Worker: procesar un segmento con su propio ProcesadorPlacas"""
+    from pipeline import ProcesadorPlacas
+
+    indice, ruta_video, inicio, fin, solape, opciones_procesador = tarea
+    opciones_procesador = dict(opciones_procesador)
+    hilos = opciones_procesador.pop('hilos', None)
+    if hilos:
+        configurar_hilos(hilos)
+    carpeta_recortes = opciones_procesador.pop('carpeta_recortes', None)
+    almacen = AlmacenRecortes(carpeta_recortes, escritor=f"seg{indice}") if carpeta_recortes else None
+    procesador = ProcesadorPlacas(
+        plantilla_imagen=PLANTILLA_IMAGEN_SEGMENTO.format(segmento=indice),
+        verbose=False,
+        almacen=almacen,
+        **opciones_procesador
+    )
+
+    desde = max(0, inicio - solape)
+    cap = cv2.VideoCapture(ruta_video)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, desde)
+
+    results = {}
+    cabeza = {}
+    cola = {}
+    frame_nmr = desde
+    inicio_tiempo = time.time()
+
+    while fin is None or frame_nmr < fin:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        if frame_nmr < inicio:
+            # Calentamiento: solo seguimiento, sin placas ni OCR
+            cabeza[frame_nmr] = _cajas(procesador.rastrear(frame_nmr, frame))
+        else:
+            track_ids, results[frame_nmr] = procesador.procesar_frame(frame_nmr, frame)
+            if fin is not None and frame_nmr >= fin - solape:
+                cola[frame_nmr] = _cajas(track_ids)
+
+        frame_nmr += 1
+
+    cap.release()
+    if almacen is not None:
+        almacen.cerrar()
+
+    return {
+        'indice': indice,
+        'results': results,
+        'cabeza': cabeza,
+        'cola': cola,
+        'lecturas': procesador.lecturas_por_auto,
+        'frames': frame_nmr - inicio,
+        'tiempo': time.time() - inicio_tiempo,
+    }
+
+
+def emparejar_tracks(cola, cabeza, lecturas_a, lecturas_b, iou_minimo=0.3):
+    """Emparejar tracks del final de un segmento con los del calentamiento del siguiente
+
+    El costo combina el IoU medio en los frames comunes con la continuidad del
+    consenso de placa: textos iguales favorecen el par y textos distintos lo
+    penalizan. Devuelve [(id_a, id_b)].
+    """
+    frames = sorted(set(cola) & set(cabeza))
+    ids_a = sorted({car for f in frames for car in cola[f]})
+    ids_b = sorted({car for f in frames for car in cabeza[f]})
+    if not ids_a or not ids_b:
+        return []
+
+    pos_a = {car: i for i, car in enumerate(ids_a)}
+    pos_b = {car: i for i, car in enumerate(ids_b)}
+    suma_iou = np.zeros((len(ids_a), len(ids_b)))
+    apariciones_a = np.zeros(len(ids_a))
+    apariciones_b = np.zeros(len(ids_b))
+
+    for f in frames:
+        fa = [pos_a[car] for car in cola[f]]
+        fb = [pos_b[car] for car in cabeza[f]]
+        apariciones_a[fa] += 1
+        apariciones_b[fb] += 1
+        if fa and fb:
+            suma_iou[np.ix_(fa, fb)] += iou_batch(list(cola[f].values()), list(cabeza[f].values()))
+
+    iou_medio = suma_iou / np.maximum(np.maximum.outer(apariciones_a, apariciones_b), 1)
+
+    # Continuidad del texto de placa
+    consenso_a = [license_consensus(lecturas_a.get(car, []))[0] for car in ids_a]
+    consenso_b = [license_consensus(lecturas_b.get(car, []))[0] for car in ids_b]
+    puntaje = iou_medio.copy()
+    for i, texto_a in enumerate(consenso_a):
+        for j, texto_b in enumerate(consenso_b):
+            if texto_a and texto_b and iou_medio[i, j] > 0:
+                puntaje[i, j] += 0.2 if texto_a == texto_b else -0.2
+
+    pares, _, _ = asociar(puntaje, iou_minimo)
+    return [(ids_a[i], ids_b[j]) for i, j in pares]
+
+
+def unir_segmentos(salidas):
+    """Coser tracks entre segmentos y renumerar car_id globalmente
+
+    Devuelve (results, lecturas_por_auto, mapa {(segmento, id_local): id_global},
+    primer_frame {id_global: primer frame con resultados}).
+    """
+    salidas = sorted(salidas, key=lambda s: s['indice'])
+    global_de = {}
+    siguiente_id = [1]
+
+    def id_global(segmento, car_id):
+        if (segmento, car_id) not in global_de:
+            global_de[(segmento, car_id)] = siguiente_id[0]
+            siguiente_id[0] += 1
+        return global_de[(segmento, car_id)]
+
+    results = {}
+    lecturas = {}
+    primer_frame = {}
+    for k, salida in enumerate(salidas):
+        if k > 0:
+            previa = salidas[k - 1]
+            for id_a, id_b in emparejar_tracks(previa['cola'], salida['cabeza'],
+                                               previa['lecturas'], salida['lecturas']):
+                global_de[(k, id_b)] = id_global(k - 1, id_a)
+
+        # Segmentos y frames en orden: la primera aparición de cada ID es su primer frame
+        for frame_nmr in sorted(salida['results']):
+            results[frame_nmr] = {
+                id_global(k, car_id): datos for car_id, datos in salida['results'][frame_nmr].items()
+            }
+            for car_id in results[frame_nmr]:
+                primer_frame.setdefault(car_id, frame_nmr)
+
+        for car_id, lecturas_auto in salida['lecturas'].items():
+            lecturas.setdefault(id_global(k, car_id), []).extend(lecturas_auto)
+
+    return results, lecturas, global_de, primer_frame
+
+
+def renombrar_imagenes(results_por_segmento, global_de, plantilla_final):
+    """Renombrar los recortes guardados por cada worker con el car_id global"""
+    for k, results in enumerate(results_por_segmento):
+        plantilla = PLANTILLA_IMAGEN_SEGMENTO.format(segmento=k)
+        for frame_nmr, cars in results.items():
+            for car_id in cars:
+                origen = plantilla.format(frame=frame_nmr, car=car_id)
+                if os.path.exists(origen):
+                    os.replace(origen, plantilla_final.format(frame=frame_nmr, car=global_de[(k, car_id)]))
+
+
+def procesar_fragmentado(ruta_video, workers, solape=30, opciones_procesador=None, plantilla_imagen=None):
+    """Procesar un video en `workers` procesos
+
+    Devuelve (results, lecturas_por_auto, primer_frame {car_id: frame}, tiempos).
+
+    `opciones_procesador` se pasa a ProcesadorPlacas en cada worker (tracker, politica);
+    con 'carpeta_recortes' cada worker escribe en el almacén de recortes y con
+    'hilos' limita sus hilos de CPU. En `tiempos`, 'proceso' es el bucle de
+    frames del worker más lento más la unión de segmentos, 'carga' el resto
+    (arranque de los workers y carga de sus modelos) y 'frames' los frames
+    procesados sin contar el solape.
+    """
+    total_frames = contar_frames(ruta_video)
+    if total_frames <= 0:
+        raise ValueError(f"No se pudo determinar la cantidad de frames de {ruta_video}")
+
+    segmentos = planificar_segmentos(total_frames, workers)
+    tareas = [(i, ruta_video, inicio, fin, solape, opciones_procesador or {})
+              for i, (inicio, fin) in enumerate(segmentos)]
+    print(f"🧩 {len(tareas)} segmentos de ~{total_frames // len(tareas)} frames (solape {solape})")
+
+    salidas = []
+    inicio = time.time()
+    # spawn: cada worker carga sus propios modelos sin heredar estado de torch/CUDA
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Pool(processes=len(tareas)) as pool:
+        for salida in pool.imap_unordered(procesar_segmento, tareas):
+            salidas.append(salida)
+            fps = salida['frames'] / max(salida['tiempo'], 1e-9)
+            print(f"✅ Segmento {salida['indice']} completado: {salida['frames']} frames ({fps:.1f} FPS)")
+    fin_workers = time.time()
+
+    results, lecturas, global_de, primer_frame = unir_segmentos(salidas)
+    print(f"🧵 Tracks cosidos: {len(set(global_de.values()))} vehículos globales "
+          f"a partir de {len(global_de)} tracks locales")
+
+    carpeta_recortes = (opciones_procesador or {}).get('carpeta_recortes')
+    if carpeta_recortes:
+        # Los recortes ya están en el almacén: basta con reescribir los índices
+        for k in range(len(salidas)):
+            remapear_ids(carpeta_recortes, f"seg{k}",
+                         {car_id: id_global for (s, car_id), id_global in global_de.items() if s == k})
+    elif plantilla_imagen is not None:
+        salidas = sorted(salidas, key=lambda s: s['indice'])
+        renombrar_imagenes([s['results'] for s in salidas], global_de, plantilla_imagen)
+
+    proceso = max(salida['tiempo'] for salida in salidas) + time.time() - fin_workers
+    tiempos = {'carga': time.time() - inicio - proceso, 'proceso': proceso,
+               'frames': sum(salida['frames'] for salida in salidas)}
+    return results, lecturas, primer_frame, tiempos
@@ -0,0 +1,188 @@
+"""
+Interfaz común de seguimiento de vehículos y sus implementaciones
+
+Todo tracker recibe detecciones [[x1, y1, x2, y2, score], ...] y devuelve un
+array [[x1, y1, x2, y2, car_id], ...] igual que `sort.sort.Sort.update`, así
+main.py puede cambiar de algoritmo sin tocar el resto del pipeline.
+"""
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from sort.sort import Sort, KalmanBoxTracker
+
+
+def iou_batch(boxes_a, boxes_b):
+    """IoU de todos los pares entre dos arrays Nx4 y Mx4 (vectorizado)"""
+    boxes_a = np.asarray(boxes_a, dtype=float).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=float).reshape(-1, 4)
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = w * h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def asociar(iou, umbral):
+    """Asignación húngara sobre una matriz IoU; descarta pares bajo el umbral
+
+    Devuelve (pares, filas_sin_par, columnas_sin_par).
+    """
+    filas, columnas = iou.shape
+    if filas == 0 or columnas == 0:
+        return [], list(range(filas)), list(range(columnas))
+
+    idx_filas, idx_columnas = linear_sum_assignment(-iou)
+    pares = [(f, c) for f, c in zip(idx_filas, idx_columnas) if iou[f, c] >= umbral]
+    filas_con_par = {f for f, _ in pares}
+    columnas_con_par = {c for _, c in pares}
+
+    return (pares,
+            [f for f in range(filas) if f not in filas_con_par],
+            [c for c in range(columnas) if c not in columnas_con_par])
+
+
+class Tracker:
+    """Interfaz de tracker usada por main.py"""
+
+    # Confianza mínima con la que se debe ejecutar el detector (None = por defecto de YOLO)
+    conf_deteccion = None
+
+    def update(self, dets):
+        raise NotImplementedError
+
+    def ids_activos(self):
+        """IDs de los tracks que el tracker aún puede reportar"""
+        raise NotImplementedError
+
+
+class SortTracker(Tracker):
+    """Adaptador de `sort.sort.Sort` (asociación por defecto del proyecto)"""
+
+    def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+        self.sort = Sort(max_age=max_age, min_hits=min_hits, iou_threshold=iou_threshold)
+
+    def update(self, dets):
+        return self.sort.update(np.asarray(dets).reshape(-1, 5))
+
+    def ids_activos(self):
+        # Sort.update devuelve trk.id + 1
+        return {trk.id + 1 for trk in self.sort.trackers}
+
+    def __getstate__(self):
+        # El contador de IDs es un atributo de clase: se guarda junto al estado
+        return {'sort': self.sort, 'kalman_count': KalmanBoxTracker.count}
+
+    def __setstate__(self, estado):
+        self.sort = estado['sort']
+        KalmanBoxTracker.count = max(KalmanBoxTracker.count, estado['kalman_count'])
+
+
+class ByteTracker(Tracker):
+    """Tracker estilo ByteTrack
+
+    Primera asociación: detecciones de alta confianza contra todos los tracks
+    (activos y perdidos). Segunda asociación: los tracks activos que quedaron
+    sin par contra las detecciones de baja confianza, que SORT descarta y que
+    suelen ser vehículos parcialmente ocluidos. Los tracks perdidos se
+    conservan `track_buffer` frames antes de retirarlos, lo que evita que un
+    vehículo reciba un ID nuevo tras una oclusión corta.
+    """
+
+    conf_deteccion = 0.1
+
+    def __init__(self, high_thresh=0.5, low_thresh=0.1, new_track_thresh=0.6,
+                 match_iou=0.2, low_match_iou=0.5, track_buffer=30, min_hits=3):
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.new_track_thresh = new_track_thresh
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.track_buffer = track_buffer
+        self.min_hits = min_hits
+        self.conf_deteccion = low_thresh
+
+        self.tracks = []
+        self.frame_count = 0
+        self.next_id = 1
+
+    def _predecir(self):
+        """Predecir todos los tracks y descartar los que divergen"""
+        predicciones = []
+        vivos = []
+        for track in self.tracks:
+            caja = np.asarray(track.predict()).reshape(-1)[:4]
+            if np.all(np.isfinite(caja)):
+                predicciones.append(caja)
+                vivos.append(track)
+        self.tracks = vivos
+        return np.asarray(predicciones, dtype=float).reshape(-1, 4)
+
+    def update(self, dets):
+        self.frame_count += 1
+        dets = np.asarray(dets, dtype=float).reshape(-1, 5)
+        predicciones = self._predecir()
+
+        altas = np.flatnonzero(dets[:, 4] >= self.high_thresh)
+        bajas = np.flatnonzero((dets[:, 4] >= self.low_thresh) & (dets[:, 4] < self.high_thresh))
+
+        # Primera pasada: detecciones de alta confianza contra todos los tracks
+        iou = iou_batch(predicciones, dets[altas, :4])
+        pares, tracks_libres, altas_libres = asociar(iou, self.match_iou)
+        for t, d in pares:
+            self.tracks[t].update(dets[altas[d]])
+
+        # Segunda pasada: tracks activos sin par contra detecciones de baja confianza
+        activos_libres = [t for t in tracks_libres if self.tracks[t].time_since_update <= 1]
+        iou = iou_batch(predicciones[activos_libres], dets[bajas, :4])
+        pares, _, _ = asociar(iou, self.low_match_iou)
+        for t, d in pares:
+            self.tracks[activos_libres[t]].update(dets[bajas[d]])
+
+        # Tracks nuevos solo desde detecciones de alta confianza
+        for d in altas_libres:
+            if dets[altas[d], 4] >= self.new_track_thresh:
+                track = KalmanBoxTracker(dets[altas[d]])
+                track.track_id = self.next_id
+                self.next_id += 1
+                self.tracks.append(track)
+
+        salida = []
+        vivos = []
+        for track in self.tracks:
+            # hits y no hit_streak: predict() reinicia la racha mientras el track está perdido y
+            # un track confirmado que se recupera tras una oclusión debe reportarse de inmediato
+            confirmado = track.hits >= self.min_hits or self.frame_count <= self.min_hits
+            if track.time_since_update == 0 and confirmado:
+                caja = np.asarray(track.get_state()).reshape(-1)[:4]
+                salida.append(np.concatenate((caja, [track.track_id])))
+
+            # Tracks sin confirmar que fallan se descartan; los confirmados esperan track_buffer
+            if track.time_since_update == 0 or (confirmado and track.time_since_update <= self.track_buffer):
+                vivos.append(track)
+        self.tracks = vivos
+
+        if len(salida) > 0:
+            return np.asarray(salida)
+        return np.empty((0, 5))
+
+    def ids_activos(self):
+        return {track.track_id for track in self.tracks}
+
+
+TRACKERS = {
+    'sort': SortTracker,
+    'bytetrack': ByteTracker,
+}
+
+
+def crear_tracker(nombre, **kwargs):
+    """Crear tracker por nombre ('sort' o 'bytetrack')"""
+    if nombre not in TRACKERS:
+        raise ValueError(f"Tracker no reconocido: {nombre} (opciones: {', '.join(TRACKERS)})")
+    return TRACKERS[nombre](**kwargs)
@@ -12,44 +12,50 @@ reader = easyocr.Reader(['en', 'es'], gpu=True)
 dict_char_to_int = {'O': '0', 'Q': '0', 'I': '1', 'L': '1', 'B': '8', 'S': '5', 'G': '6', 'Z': '2'}
 dict_int_to_char = {'0': 'O', '1': 'I', '2': 'Z', '3': 'B', '4': 'A', '5': 'S', '6': 'G', '8': 'B'}
 
+CSV_HEADER = [
+    'frame_nmr', 'car_id', 'car_bbox',
+    'license_plate_bbox', 'license_plate_bbox_score',
+    'license_number', 'license_number_score'
+]
+
+def write_csv_rows(writer, frame_nmr, cars):
+    """Escribir las filas de un frame con un csv.writer ya abierto"""
+    for car_id, data in cars.items():
+        if 'car' in data and 'license_plate' in data:
+            lp = data['license_plate']
+
+            # Manejo seguro de valores
+            car_bbox = [
+                float(x) if isinstance(x, (int, float, np.floating)) else 0
+                for x in data['car'].get('bbox', [0, 0, 0, 0])
+            ]
+            lp_bbox = [
+                float(x) if isinstance(x, (int, float, np.floating)) else 0
+                for x in lp.get('bbox', [0, 0, 0, 0])
+            ]
+
+            lp_bbox_score = float(lp.get('bbox_score', 0)) if lp.get('bbox_score') is not None else 0
+            lp_text_score = float(lp.get('text_score', 0)) if lp.get('text_score') is not None else 0
+            lp_text = lp.get('text', 'UNKNOWN')
+
+            # Convertir listas a strings compactos
+            car_bbox_str = ' '.join(map(str, car_bbox))
+            lp_bbox_str = ' '.join(map(str, lp_bbox))
+
+            writer.writerow([
+                frame_nmr, car_id, f"[{car_bbox_str}]",
+                f"[{lp_bbox_str}]", lp_bbox_score,
+                lp_text, lp_text_score
+            ])
+
 def write_csv(results, output_path):
     """Guardar resultados en archivo CSV de forma segura"""
     with open(output_path, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow([
-            'frame_nmr', 'car_id', 'car_bbox',
-            'license_plate_bbox', 'license_plate_bbox_score',
-            'license_number', 'license_number_score'
-        ])
+        writer.writerow(CSV_HEADER)
 
         for frame_nmr, cars in results.items():
-            for car_id, data in cars.items():
-                if 'car' in data and 'license_plate' in data:
-                    lp = data['license_plate']
-
-                    # Manejo seguro de valores
-                    car_bbox = [
-                        float(x) if isinstance(x, (int, float, np.floating)) else 0
-                        for x in data['car'].get('bbox', [0, 0, 0, 0])
-                    ]
-                    lp_bbox = [
-                        float(x) if isinstance(x, (int, float, np.floating)) else 0
-                        for x in lp.get('bbox', [0, 0, 0, 0])
-                    ]
-
-                    lp_bbox_score = float(lp.get('bbox_score', 0)) if lp.get('bbox_score') is not None else 0
-                    lp_text_score = float(lp.get('text_score', 0)) if lp.get('text_score') is not None else 0
-                    lp_text = lp.get('text', 'UNKNOWN')
-
-                    # Convertir listas a strings compactos
-                    car_bbox_str = ' '.join(map(str, car_bbox))
-                    lp_bbox_str = ' '.join(map(str, lp_bbox))
-
-                    writer.writerow([
-                        frame_nmr, car_id, f"[{car_bbox_str}]",
-                        f"[{lp_bbox_str}]", lp_bbox_score,
-                        lp_text, lp_text_score
-                    ])
+            write_csv_rows(writer, frame_nmr, cars)
 
 def license_complies_format(text):
     """Validar formato de placa vehicular"""
@@ -172,6 +178,31 @@ def read_license_plate(license_plate_crop):
         print(f"⚠️ Error en OCR: {e}")
         return None, None
 
+def license_consensus(readings):
+    """Consenso carácter a carácter de las lecturas de una misma placa"""
+    valid = [(text, score) for text, score in readings if text and text not in ['UNKNOWN', 'NO_OCR']]
+    if not valid:
+        return None, 0.0
+
+    # Longitud dominante según la confianza acumulada
+    weight_by_length = {}
+    for text, score in valid:
+        weight_by_length[len(text)] = weight_by_length.get(len(text), 0) + max(score or 0, 1e-3)
+    length = max(weight_by_length, key=weight_by_length.get)
+
+    # Votación ponderada por posición
+    votes = [{} for _ in range(length)]
+    for text, score in valid:
+        if len(text) == length:
+            for i, char in enumerate(text):
+                votes[i][char] = votes[i].get(char, 0) + max(score or 0, 1e-3)
+
+    consensus = ''.join(max(v, key=v.get) for v in votes)
+    total = weight_by_length[length]
+    consensus_score = sum(max(v.values()) for v in votes) / (length * total)
+
+    return consensus, consensus_score
+
 def get_car(license_plate, vehicle_track_ids):
     """Asignar placa a vehículo"""
     x1, y1, x2, y2, score, class_id = license_plate
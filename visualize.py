@@ -1,8 +1,19 @@
+import argparse
 import ast
+import bisect
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+
 import cv2
 import numpy as np
 import pandas as pd
 
+from almacen_recortes import CARPETA_ALMACEN, LectorRecortes
+from recursos import configurar_hilos, hilos_por_proceso, nucleos_disponibles
+
 def draw_border(img, top_left, bottom_right, color=(0, 255, 0), thickness=10, line_length_x=200, line_length_y=200):
     """Dibujar bordes estilizados alrededor de vehículos"""
     x1, y1 = top_left
@@ -31,7 +42,241 @@ def parse_bbox(bbox_str):
         coords = bbox_str.strip('[]').split()
         return [float(x) for x in coords if x]
 
+def indexar_por_frame(results):
+    """Agrupar las detecciones por frame con las cajas ya parseadas: {frame_nmr: [(car_id, car_bbox, lp_bbox)]}"""
+    indice = {}
+    for row in results.itertuples(index=False):
+        try:
+            indice.setdefault(int(row.frame_nmr), []).append(
+                (row.car_id, parse_bbox(row.car_bbox), parse_bbox(row.license_plate_bbox))
+            )
+        except Exception as e:
+            print(f"⚠️ Error procesando fila del frame {row.frame_nmr}: {e}")
+    return indice
+
+def dibujar_frame(frame, frame_nmr, detecciones, license_plate_data):
+    """Dibujar vehículos, placas y la mejor lectura de cada vehículo sobre el frame"""
+    width = frame.shape[1]
+
+    for car_id, car_bbox, lp_bbox in detecciones:
+        try:
+            # Dibujar vehículo
+            car_x1, car_y1, car_x2, car_y2 = car_bbox
+            
+            draw_border(frame, (int(car_x1), int(car_y1)), (int(car_x2), int(car_y2)), 
+                       (0, 255, 0), 15, line_length_x=100, line_length_y=100)
+            
+            # Dibujar placa
+            lp_x1, lp_y1, lp_x2, lp_y2 = lp_bbox
+            
+            cv2.rectangle(frame, (int(lp_x1), int(lp_y1)), (int(lp_x2), int(lp_y2)), (0, 0, 255), 3)
+            
+            # Mostrar información de la placa
+            if car_id in license_plate_data:
+                plate_info = license_plate_data[car_id]
+                license_crop = plate_info['crop']
+                license_text = plate_info['text']
+                
+                # Posición para mostrar la placa ampliada
+                crop_h, crop_w = license_crop.shape[:2]
+                
+                # Calcular posición arriba del vehículo
+                display_x = max(0, int((car_x1 + car_x2 - crop_w) / 2))
+                display_y = max(crop_h + 60, int(car_y1) - crop_h - 60)
+                
+                # Asegurar que no se salga de la imagen
+                if display_x + crop_w > width:
+                    display_x = width - crop_w
+                if display_y < 0:
+                    display_y = int(car_y2) + 20
+                
+                # Mostrar imagen de placa ampliada
+                try:
+                    frame[display_y:display_y + crop_h, display_x:display_x + crop_w] = license_crop
+                    
+                    # Fondo para el texto
+                    text_bg_y = display_y - 50
+                    if text_bg_y < 0:
+                        text_bg_y = display_y + crop_h + 10
+                    
+                    cv2.rectangle(frame, (display_x, text_bg_y), 
+                                (display_x + crop_w, text_bg_y + 40), (0, 0, 0), -1)
+                    
+                    # Texto de la placa
+                    font_scale = min(1.2, crop_w / 150)
+                    cv2.putText(frame, license_text, (display_x + 5, text_bg_y + 30),
+                              cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 255, 255), 2)
+                    
+                    # Mostrar confianza si es válida
+                    if plate_info['score'] > 0:
+                        conf_text = f"Conf: {plate_info['score']:.2f}"
+                        cv2.putText(frame, conf_text, (display_x + 5, text_bg_y + 15),
+                                  cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+                
+                except Exception as e:
+                    # Si hay error mostrando la imagen, solo mostrar el texto
+                    cv2.putText(frame, license_text, (int(car_x1), int(car_y1) - 10),
+                              cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+            
+        except Exception as e:
+            print(f"⚠️ Error procesando frame {frame_nmr}: {e}")
+            continue
+
+    return frame
+
+def renderizar_rango(tarea):
+    """Renderizar los frames [inicio, fin) en su propio archivo; devuelve la cantidad escrita"""
+    ruta_video, inicio, fin, ruta_salida, indice, license_plate_data, mostrar_progreso, hilos = tarea
+    if hilos:
+        configurar_hilos(hilos)
+
+    cap = cv2.VideoCapture(ruta_video)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    out = cv2.VideoWriter(ruta_salida, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+
+    if inicio > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, inicio)
+
+    frame_nmr = inicio
+    while fin is None or frame_nmr < fin:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        out.write(dibujar_frame(frame, frame_nmr, indice.get(frame_nmr, []), license_plate_data))
+        
+        # Mostrar progreso cada 100 frames
+        if mostrar_progreso and frame_nmr % 100 == 0:
+            print(f"📹 Procesando frame {frame_nmr}...")
+        
+        frame_nmr += 1
+
+    out.release()
+    cap.release()
+    return frame_nmr - inicio
+
+def fotogramas_clave(ruta_video, fps):
+    """Números de frame de los fotogramas clave según ffprobe (sin decodificar), o None"""
+    try:
+        salida = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', ruta_video],
+            capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    paquetes = []
+    for linea in salida.splitlines():
+        pts, _, flags = linea.partition(',')
+        if pts not in ('', 'N/A'):
+            paquetes.append((float(pts), 'K' in flags))
+    if not paquetes:
+        return None
+
+    # El primer pts puede no ser cero (start_time del contenedor)
+    base = min(pts for pts, _ in paquetes)
+    return sorted({int(round((pts - base) * fps)) for pts, clave in paquetes if clave})
+
+def planificar_rangos(ruta_video, inicio, fin, partes, fps):
+    """Dividir [inicio, fin) en rangos contiguos con cortes en fotogramas clave
+
+    Cada corte se mueve al fotograma clave más cercano al reparto uniforme, así
+    cada proceso arranca en un punto de acceso exacto y barato del video. Sin
+    ffprobe se usa el reparto uniforme.
+    """
+    uniformes = [int(x) for x in np.linspace(inicio, fin, partes + 1)[1:-1]]
+    claves = fotogramas_clave(ruta_video, fps)
+
+    if claves:
+        cortes = []
+        for objetivo in uniformes:
+            pos = bisect.bisect_left(claves, objetivo)
+            vecinos = [k for k in claves[max(0, pos - 1):pos + 1] if inicio < k < fin]
+            if vecinos:
+                cortes.append(min(vecinos, key=lambda k: abs(k - objetivo)))
+        print(f"🔑 Cortes alineados a {len(claves)} fotogramas clave")
+    else:
+        cortes = uniformes
+        print("⚠️ ffprobe no disponible: rangos uniformes sin alinear a fotogramas clave")
+
+    limites = [inicio] + sorted(set(c for c in cortes if inicio < c < fin)) + [fin]
+    return list(zip(limites[:-1], limites[1:]))
+
+def concatenar(partes, ruta_salida):
+    """Unir los segmentos sin recodificar (ffmpeg concat); sin ffmpeg se recodifica con OpenCV"""
+    lista = os.path.join(os.path.dirname(partes[0]), 'partes.txt')
+    with open(lista, 'w', encoding='utf-8') as f:
+        for parte in partes:
+            f.write(f"file '{os.path.abspath(parte)}'\n")
+
+    try:
+        subprocess.run(['ffmpeg', '-y', '-v', 'error', '-f', 'concat', '-safe', '0', '-i', lista,
+                        '-c', 'copy', ruta_salida], check=True)
+        return
+    except (OSError, subprocess.CalledProcessError):
+        print("⚠️ ffmpeg no disponible: uniendo los segmentos con OpenCV (recodifica)")
+
+    out = None
+    for parte in partes:
+        cap = cv2.VideoCapture(parte)
+        if out is None:
+            out = cv2.VideoWriter(ruta_salida, cv2.VideoWriter_fourcc(*'mp4v'), cap.get(cv2.CAP_PROP_FPS),
+                                  (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            out.write(frame)
+        cap.release()
+    out.release()
+
+def renderizar_en_paralelo(ruta_video, rangos, ruta_salida, indice, license_plate_data):
+    """Renderizar cada rango en un proceso y concatenar los segmentos en orden"""
+    carpeta = tempfile.mkdtemp(prefix='.render_', dir=os.path.dirname(os.path.abspath(ruta_salida)))
+    partes = [os.path.join(carpeta, f"parte_{i:03d}.mp4") for i in range(len(rangos))]
+    hilos = hilos_por_proceso(nucleos_disponibles(), len(rangos))
+
+    # Cada proceso recibe solo las detecciones de su rango
+    tareas = [
+        (ruta_video, inicio, fin, parte, {f: indice[f] for f in range(inicio, fin) if f in indice},
+         license_plate_data, False, hilos)
+        for (inicio, fin), parte in zip(rangos, partes)
+    ]
+    print(f"🧩 Renderizando {len(tareas)} rangos en paralelo ({hilos} hilos por proceso)")
+
+    try:
+        frames = 0
+        contexto = multiprocessing.get_context('spawn')
+        with contexto.Pool(processes=len(tareas)) as pool:
+            for (inicio, fin), escritos in zip(rangos, pool.imap(renderizar_rango, tareas)):
+                frames += escritos
+                print(f"✅ Rango {inicio}-{fin} renderizado ({escritos} frames)")
+
+        concatenar(partes, ruta_salida)
+        return frames
+    except Exception as e:
+        print(f"❌ Error en el render paralelo: {e}")
+        return None
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generar el video anotado con las placas detectadas")
+    parser.add_argument('--video', help="Ruta del video (si se omite se pregunta por consola)")
+    parser.add_argument('--almacen-recortes', nargs='?', const=CARPETA_ALMACEN, default=None, metavar='CARPETA',
+                        help="Tomar el recorte de la mejor placa del almacén indexado en lugar del video")
+    parser.add_argument('--salida', default='./out.mp4', help="Ruta del video de salida")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Renderizar en N procesos por rangos de frames y concatenar sin recodificar")
+    parser.add_argument('--desde', type=float, default=None, help="Inicio de la ventana a renderizar (segundos)")
+    parser.add_argument('--hasta', type=float, default=None, help="Fin de la ventana a renderizar (segundos)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("🎬 Iniciando visualización...")
     
     # Cargar datos
@@ -47,22 +292,27 @@ def main():
             return
 
     # Cargar video
-    ruta_video = input("👉 Ingresa la ruta del video: ")
+    ruta_video = args.video or input("👉 Ingresa la ruta del video: ")
     cap = cv2.VideoCapture(ruta_video)
     
     if not cap.isOpened():
         print("❌ Error al abrir el video")
         return
 
-    # Configurar video de salida
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    # Propiedades del video de salida
     fps = cap.get(cv2.CAP_PROP_FPS)
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    out = cv2.VideoWriter('./out.mp4', fourcc, fps, (width, height))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
     print(f"📹 Video: {width}x{height} @ {fps} FPS")
 
+    # Recortes guardados durante la detección (evita buscar cada frame en el video)
+    almacen = None
+    if args.almacen_recortes:
+        almacen = LectorRecortes(args.almacen_recortes)
+        print(f"📦 Almacén de recortes: {len(almacen)} recortes")
+
     # Preparar datos de placas por vehículo
     license_plate_data = {}
     
@@ -80,11 +330,20 @@ def main():
                 best_text = row['license_number']
                 best_frame = row['frame_nmr']
         
-        # Obtener imagen de la placa
-        cap.set(cv2.CAP_PROP_POS_FRAMES, best_frame)
-        ret, frame = cap.read()
-        
         license_crop = None
+        if almacen is not None:
+            license_crop = almacen.leer(best_frame, car_id)
+            if license_crop is not None and license_crop.size > 0:
+                h, w = license_crop.shape[:2]
+                new_height = 80
+                license_crop = cv2.resize(license_crop, (int(new_height * w / h), new_height))
+
+        # Obtener imagen de la placa desde el video si no está en el almacén
+        ret = False
+        if license_crop is None:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, best_frame)
+            ret, frame = cap.read()
+        
         if ret:
             try:
                 bbox = parse_bbox(car_data[car_data['frame_nmr'] == best_frame]['license_plate_bbox'].iloc[0])
@@ -114,101 +373,33 @@ def main():
 
     print(f"🚗 Procesados {len(license_plate_data)} vehículos únicos")
 
-    # Procesar video frame por frame
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-    frame_nmr = 0
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        # Obtener detecciones para este frame
-        frame_data = results[results['frame_nmr'] == frame_nmr]
-        
-        for _, row in frame_data.iterrows():
-            try:
-                car_id = row['car_id']
-                
-                # Dibujar vehículo
-                car_bbox = parse_bbox(row['car_bbox'])
-                car_x1, car_y1, car_x2, car_y2 = car_bbox
-                
-                draw_border(frame, (int(car_x1), int(car_y1)), (int(car_x2), int(car_y2)), 
-                           (0, 255, 0), 15, line_length_x=100, line_length_y=100)
-                
-                # Dibujar placa
-                lp_bbox = parse_bbox(row['license_plate_bbox'])
-                lp_x1, lp_y1, lp_x2, lp_y2 = lp_bbox
-                
-                cv2.rectangle(frame, (int(lp_x1), int(lp_y1)), (int(lp_x2), int(lp_y2)), (0, 0, 255), 3)
-                
-                # Mostrar información de la placa
-                if car_id in license_plate_data:
-                    plate_info = license_plate_data[car_id]
-                    license_crop = plate_info['crop']
-                    license_text = plate_info['text']
-                    
-                    # Posición para mostrar la placa ampliada
-                    crop_h, crop_w = license_crop.shape[:2]
-                    
-                    # Calcular posición arriba del vehículo
-                    display_x = max(0, int((car_x1 + car_x2 - crop_w) / 2))
-                    display_y = max(crop_h + 60, int(car_y1) - crop_h - 60)
-                    
-                    # Asegurar que no se salga de la imagen
-                    if display_x + crop_w > width:
-                        display_x = width - crop_w
-                    if display_y < 0:
-                        display_y = int(car_y2) + 20
-                    
-                    # Mostrar imagen de placa ampliada
-                    try:
-                        frame[display_y:display_y + crop_h, display_x:display_x + crop_w] = license_crop
-                        
-                        # Fondo para el texto
-                        text_bg_y = display_y - 50
-                        if text_bg_y < 0:
-                            text_bg_y = display_y + crop_h + 10
-                        
-                        cv2.rectangle(frame, (display_x, text_bg_y), 
-                                    (display_x + crop_w, text_bg_y + 40), (0, 0, 0), -1)
-                        
-                        # Texto de la placa
-                        font_scale = min(1.2, crop_w / 150)
-                        cv2.putText(frame, license_text, (display_x + 5, text_bg_y + 30),
-                                  cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 255, 255), 2)
-                        
-                        # Mostrar confianza si es válida
-                        if plate_info['score'] > 0:
-                            conf_text = f"Conf: {plate_info['score']:.2f}"
-                            cv2.putText(frame, conf_text, (display_x + 5, text_bg_y + 15),
-                                      cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-                    
-                    except Exception as e:
-                        # Si hay error mostrando la imagen, solo mostrar el texto
-                        cv2.putText(frame, license_text, (int(car_x1), int(car_y1) - 10),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-                
-            except Exception as e:
-                print(f"⚠️ Error procesando frame {frame_nmr}: {e}")
-                continue
-        
-        # Escribir frame al video de salida
-        out.write(frame)
-        
-        # Mostrar progreso cada 100 frames
-        if frame_nmr % 100 == 0:
-            print(f"📹 Procesando frame {frame_nmr}...")
-        
-        frame_nmr += 1
-
-    # Limpiar recursos
-    out.release()
     cap.release()
-    
-    print(f"✅ Video generado: ./out.mp4")
-    print(f"📊 Total de frames procesados: {frame_nmr}")
+    if almacen is not None:
+        almacen.cerrar()
+
+    # Pre-indexar las detecciones por frame (una sola pasada sobre el CSV)
+    indice = indexar_por_frame(results)
+
+    # Rango a renderizar: todo el video o la ventana pedida (fin=None: hasta el final)
+    inicio = int(round(args.desde * fps)) if args.desde is not None else 0
+    fin = int(round(args.hasta * fps)) if args.hasta is not None else None
+    if total_frames > 0:
+        fin = total_frames if fin is None else min(fin, total_frames)
+    if fin is not None and fin <= inicio:
+        print("❌ La ventana de tiempo pedida está vacía")
+        return
+
+    # Sin conteo de frames no se puede repartir el video
+    if args.workers <= 1 or fin is None:
+        frames = renderizar_rango((ruta_video, inicio, fin, args.salida, indice, license_plate_data, True, None))
+    else:
+        rangos = planificar_rangos(ruta_video, inicio, fin, args.workers, fps)
+        frames = renderizar_en_paralelo(ruta_video, rangos, args.salida, indice, license_plate_data)
+        if frames is None:
+            return
+
+    print(f"✅ Video generado: {args.salida}")
+    print(f"📊 Total de frames procesados: {frames}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Coincidencia en tiempo real de placas contra una lista de vigilancia (watchlist)
+
+La distancia de edición pondera como baratas las sustituciones entre caracteres
+que el OCR confunde con frecuencia (O/0, I/1, B/8, S/5...), usando los mismos
+mapeos de util.py. Las placas de la lista se precompilan en un índice de
+claves canónicas con variantes por borrado para que cada consulta tome
+fracciones de milisegundo.
+"""
+import json
+import os
+import socket
+import time
+
+from util import dict_char_to_int, dict_int_to_char
+
+# Costos en unidades enteras: una sustitución por confusión OCR vale 1/4 de edición
+COSTO_CONFUSION = 1
+COSTO_EDICION = 4
+
+
+def _clases_confusion():
+    """Agrupar caracteres confundibles en clases (unión de los mapeos de util.py)"""
+    padre = {}
+
+    def raiz(c):
+        while padre.setdefault(c, c) != c:
+            c = padre[c]
+        return c
+
+    for mapeo in (dict_char_to_int, dict_int_to_char):
+        for a, b in mapeo.items():
+            padre[raiz(a)] = raiz(b)
+
+    return {c: raiz(c) for c in padre}
+
+
+CLASE_CONFUSION = _clases_confusion()
+
+
+def normalizar_placa(texto):
+    """Normalizar texto de placa (mayúsculas, sin espacios, guiones ni puntos)"""
+    return texto.upper().replace(' ', '').replace('-', '').replace('.', '')
+
+
+def clave_canonica(texto):
+    """Clave donde todos los caracteres confundibles colapsan a su clase"""
+    return ''.join(CLASE_CONFUSION.get(c, c) for c in texto)
+
+
+def costo_sustitucion(a, b):
+    if a == b:
+        return 0
+    if CLASE_CONFUSION.get(a, a) == CLASE_CONFUSION.get(b, b):
+        return COSTO_CONFUSION
+    return COSTO_EDICION
+
+
+def distancia_ponderada(a, b, limite=None):
+    """Levenshtein con sustituciones ponderadas por confusión OCR (unidades enteras)
+
+    Si se indica `limite`, se corta en cuanto toda la fila supera el límite y se
+    devuelve limite + 1.
+    """
+    if a == b:
+        return 0
+
+    previa = [j * COSTO_EDICION for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        actual = [i * COSTO_EDICION]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(
+                previa[j] + COSTO_EDICION,
+                actual[j - 1] + COSTO_EDICION,
+                previa[j - 1] + costo_sustitucion(ca, cb)
+            ))
+        if limite is not None and min(actual) > limite:
+            return limite + 1
+        previa = actual
+
+    return previa[-1]
+
+
+def _borrados(texto, k):
+    """Todas las variantes de `texto` con hasta k caracteres eliminados"""
+    variantes = {texto}
+    frontera = {texto}
+    for _ in range(k):
+        frontera = {t[:i] + t[i + 1:] for t in frontera for i in range(len(t))}
+        variantes |= frontera
+    return variantes
+
+
+class WatchlistIndex:
+    """Índice precompilado de placas vigiladas
+
+    Las placas se indexan por su clave canónica (las confusiones OCR colapsan)
+    y por todas las variantes de esa clave con hasta `max_ediciones` borrados.
+    Si dos placas están a distancia ponderada <= k ediciones, sus claves
+    canónicas comparten alguna variante, así que una consulta solo verifica
+    los pocos candidatos que caen en las mismas entradas del diccionario.
+    """
+
+    def __init__(self, placas=None, max_ediciones=2):
+        self.max_ediciones = max_ediciones
+        self.notas = {}
+        self.por_variante = {}
+        self._cache = {}
+
+        for placa, nota in (placas or {}).items():
+            self.agregar(placa, nota)
+
+    def __len__(self):
+        return len(self.notas)
+
+    @classmethod
+    def desde_archivo(cls, ruta, max_ediciones=2):
+        """Cargar lista: una placa por línea, opcionalmente `PLACA,nota`; '#' comenta"""
+        placas = {}
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea or linea.startswith('#'):
+                    continue
+                placa, _, nota = linea.partition(',')
+                placa = normalizar_placa(placa)
+                if placa and placa.lower() not in ('placa', 'plate', 'license_number'):
+                    placas[placa] = nota.strip()
+        return cls(placas, max_ediciones=max_ediciones)
+
+    def agregar(self, placa, nota=''):
+        placa = normalizar_placa(placa)
+        if placa not in self.notas:
+            for variante in _borrados(clave_canonica(placa), self.max_ediciones):
+                self.por_variante.setdefault(variante, []).append(placa)
+            self._cache.clear()
+        self.notas[placa] = nota
+
+    def buscar(self, texto, umbral=1.0):
+        """Devolver [(placa, distancia_en_ediciones)] ordenado por distancia
+
+        `umbral` se expresa en ediciones completas: 1.0 admite una edición real
+        o hasta cuatro confusiones OCR. No puede superar `max_ediciones`.
+        """
+        if not self.notas or not texto:
+            return []
+
+        texto = normalizar_placa(texto)
+        limite = int(round(min(umbral, self.max_ediciones) * COSTO_EDICION))
+        clave = (texto, limite)
+        if clave in self._cache:
+            return self._cache[clave]
+
+        candidatos = set()
+        for variante in _borrados(clave_canonica(texto), limite // COSTO_EDICION):
+            candidatos.update(self.por_variante.get(variante, ()))
+
+        encontrados = []
+        for placa in candidatos:
+            d = distancia_ponderada(texto, placa, limite)
+            if d <= limite:
+                encontrados.append((placa, d / COSTO_EDICION))
+        encontrados.sort(key=lambda x: (x[1], x[0]))
+
+        if len(self._cache) > 10000:
+            self._cache.clear()
+        self._cache[clave] = encontrados
+        return encontrados
+
+
+class FileSink:
+    """Escribir alertas como líneas JSON en un archivo"""
+
+    def __init__(self, ruta):
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self.f = open(ruta, 'a', encoding='utf-8')
+
+    def emit(self, alerta):
+        self.f.write(json.dumps(alerta, ensure_ascii=False) + '\n')
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class SocketSink:
+    """Enviar alertas como datagramas JSON a un socket local (UDP o Unix)"""
+
+    def __init__(self, direccion):
+        if isinstance(direccion, tuple):
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.direccion = direccion
+
+    def emit(self, alerta):
+        try:
+            self.sock.sendto(json.dumps(alerta, ensure_ascii=False).encode('utf-8'), self.direccion)
+        except OSError as e:
+            # Nunca frenar el procesamiento por un receptor caído
+            print(f"⚠️ No se pudo enviar alerta a {self.direccion}: {e}")
+
+    def close(self):
+        self.sock.close()
+
+
+class PrintSink:
+    """Mostrar alertas por consola"""
+
+    def emit(self, alerta):
+        print(f"🚨 Placa vigilada {alerta['placa_lista']} (leída {alerta['texto_leido']}, "
+              f"distancia {alerta['distancia']:.2f}) - Frame {alerta['frame_nmr']}, Car ID {alerta['car_id']}")
+
+    def close(self):
+        pass
+
+
+def crear_sink(spec):
+    """Crear sink desde texto: 'print', 'file:ruta', 'udp:host:puerto' o 'unix:ruta'"""
+    tipo, _, destino = spec.partition(':')
+    if tipo == 'print':
+        return PrintSink()
+    if tipo == 'file' and destino:
+        return FileSink(destino)
+    if tipo == 'udp' and destino:
+        host, _, puerto = destino.rpartition(':')
+        return SocketSink((host or '127.0.0.1', int(puerto)))
+    if tipo == 'unix' and destino:
+        return SocketSink(destino)
+    raise ValueError(f"Sink de watchlist no reconocido: {spec}")
+
+
+class WatchlistMatcher:
+    """Comparar el consenso de placa de cada track contra la watchlist
+
+    Cada par (car_id, placa vigilada) se alerta una sola vez aunque el consenso
+    siga actualizándose.
+    """
+
+    def __init__(self, index, sinks, umbral=1.0, score_minimo=0.0):
+        self.index = index
+        self.sinks = list(sinks)
+        self.umbral = umbral
+        self.score_minimo = score_minimo
+        self.alertados = set()
+
+    def update(self, frame_nmr, car_id, texto, score):
+        """Procesar una actualización de consenso; devuelve las alertas emitidas"""
+        if not texto or texto in ('UNKNOWN', 'NO_OCR') or score < self.score_minimo:
+            return []
+
+        alertas = []
+        for placa, distancia in self.index.buscar(texto, self.umbral):
+            if (car_id, placa) in self.alertados:
+                continue
+            self.alertados.add((car_id, placa))
+
+            alerta = {
+                'timestamp': time.time(),
+                'frame_nmr': frame_nmr,
+                'car_id': car_id,
+                'texto_leido': texto,
+                'score': float(score),
+                'placa_lista': placa,
+                'distancia': distancia,
+                'nota': self.index.notas.get(placa, '')
+            }
+            for sink in self.sinks:
+                sink.emit(alerta)
+            alertas.append(alerta)
+
+        return alertas
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()